@@ -0,0 +1,110 @@
+"""
+JWT authentication with the user resolved from the cache instead of a query per request.
+
+- only what authentication and the permission checks read is cached: the user id, is_active, is_superuser, role,
+  is_verified, the author id (or its absence) and a hash of the password hash, never the row itself
+- request.user is rebuilt from it with the other fields deferred (loaded on first access) and request.user.author
+  holding only its primary key. It is for reading, views that save the user or the author load their row first
+- entries are keyed by the user id claim and a per-user version, every save or delete of the user or its author
+  (accounts/signals.py) moves the version once the transaction commits
+- a request that loaded the old row while the version moved stores it under the old version, where no one reads it,
+  so a change is never hidden for longer than it takes to commit
+- the is_active and password-changed (CHECK_REVOKE_TOKEN) checks still run on every request against the cached fields
+"""
+
+import time
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+from .models import Author
+
+
+USER_CACHE_TTL = 60 * 10
+USER_VERSION_TTL = 60 * 60 * 24
+USER_CACHE_FIELDS = ("id", "is_active", "is_superuser", "role", "is_verified")
+
+
+def user_version_key(user_id):
+    return f"auth:user:{user_id}:version"
+
+
+def user_cache_key(user_id, version):
+    return f"auth:user:{user_id}:{version}"
+
+
+def user_version(user_id):
+    key = user_version_key(user_id)
+    version = cache.get(key)
+
+    if version is None:
+        cache.add(key, time.time_ns(), USER_VERSION_TTL)
+        version = cache.get(key)
+
+    return version
+
+
+def forget_user(user_id):
+    transaction.on_commit(
+        lambda: cache.set(user_version_key(user_id), time.time_ns(), USER_VERSION_TTL),
+        robust=True,
+    )
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+        row = self.load_user(user_id)
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not row["is_active"]:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != row["password_hash"]:
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        return self.build_user(row)
+
+    def load_user(self, user_id):
+        """
+        The cached fields of the user, read from the database on a miss.
+        """
+        key = user_cache_key(user_id, user_version(user_id))
+
+        row = cache.get(key)
+        if row is not None:
+            return row
+
+        try:
+            user = self.user_model.objects.select_related("author").get(**{api_settings.USER_ID_FIELD: user_id})
+        except self.user_model.DoesNotExist as e:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found") from e
+
+        author = getattr(user, "author", None)
+        row = {field: getattr(user, field) for field in USER_CACHE_FIELDS}
+        row["author_id"] = author.pk if author else None
+        row["password_hash"] = get_md5_hash_password(user.password)
+
+        cache.set(key, row, USER_CACHE_TTL)
+        return row
+
+    def build_user(self, row):
+        # from_db() takes the values in the model's field order, the fields left out are deferred
+        fields = [field.attname for field in self.user_model._meta.concrete_fields
+                  if field.attname in USER_CACHE_FIELDS]
+        user = self.user_model.from_db(None, fields, [row[field] for field in fields])
+
+        author = None
+        if row["author_id"] is not None:
+            author = Author.from_db(None, ("id", "user_id"), (row["author_id"], user.pk))
+        self.user_model._meta.get_field("author").set_cached_value(user, author)
+
+        return user
@@ -0,0 +1,47 @@
+"""
+Who is making the request, resolved once per request and kept on it.
+
+- permission checks and views compare ids (obj.author_id == identity.author_id) instead of loading
+  obj.author.user and comparing users, which costs two queries per check
+- the author id is read from request.user.author, which CachedJWTAuthentication has already loaded with the user,
+  so resolving the identity doesn't query either
+"""
+
+from collections import namedtuple
+
+
+Identity = namedtuple("Identity", ["user_id", "author_id", "role", "is_verified"])
+
+ANONYMOUS = Identity(user_id=None, author_id=None, role=None, is_verified=False)
+
+MODERATION_ROLES = ("superuser", "admin", "moderator")
+
+
+def identity(request):
+    resolved = getattr(request, "_identity", None)
+    if resolved is not None:
+        return resolved
+
+    user = request.user
+    if user.is_authenticated:
+        author = getattr(user, "author", None)
+        resolved = Identity(
+            user_id=user.pk,
+            author_id=author.pk if author else None,
+            role=user.role,
+            is_verified=user.is_verified,
+        )
+    else:
+        resolved = ANONYMOUS
+
+    request._identity = resolved
+    return resolved
+
+
+def is_story_author(request, story):
+    author_id = identity(request).author_id
+    return author_id is not None and story.author_id == author_id
+
+
+def is_moderator(request):
+    return identity(request).role in MODERATION_ROLES
@@ -0,0 +1,20 @@
+# Generated by Django 6.0 on 2026-10-17 22:30
+
+import django.db.models.functions.text
+from django.db import migrations, models
+from core.operations import AddIndexConcurrentlyIfPostgres
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('accounts', '0004_user_role'),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyIfPostgres(
+            model_name='author',
+            index=models.Index(django.db.models.functions.text.Upper('pen_name'), name='author_pen_name_upper_idx'),
+        ),
+    ]
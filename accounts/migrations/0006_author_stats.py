@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_author_author_pen_name_upper_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='author',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='author',
+            name='total_dislikes',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='author',
+            name='total_likes',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='author',
+            name='total_ratings',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='author',
+            name='total_reviews',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='author',
+            name='total_stories',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -1,7 +1,9 @@
 from django.db import models
+from django.db.models.functions import Upper
 from django.contrib.auth.models import AbstractUser, UserManager
 
 import uuid
+from decimal import Decimal
 
 class CustomUserManager(UserManager):
     def create_user(self, username, email, password = None, **extra_fields):
@@ -60,6 +62,27 @@ class Author(models.Model):
     pen_name = models.CharField(max_length=50, unique=True)
     ban_status = models.BooleanField(default=False)
 
+    # dashboard counters over the author's stories, kept up to date by the story write paths (stories/counters.py)
+    # and reconciled periodically
+    total_stories = models.PositiveIntegerField(default=0)
+    total_likes = models.PositiveIntegerField(default=0)
+    total_dislikes = models.PositiveIntegerField(default=0)
+    total_reviews = models.PositiveIntegerField(default=0)
+    total_ratings = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+
+    @property
+    def mean_rating(self):
+        if not self.total_ratings:
+            return Decimal("0")
+        return Decimal(self.rating_sum) / self.total_ratings
+
+    class Meta:
+        # stories are filtered by author__pen_name__iexact, i.e. UPPER(pen_name) = UPPER(%s) on PostgreSQL
+        indexes = [
+            models.Index(Upper("pen_name"), name="author_pen_name_upper_idx"),
+        ]
+
 
 
 
@@ -1,10 +1,11 @@
 import re
 from rest_framework import serializers
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
 from .models import User, Author
+from .tokens import RefreshToken
 
 
 User = get_user_model()
@@ -53,6 +54,24 @@ class AuthorSerializer(serializers.ModelSerializer):
 
         return value
 
+    def update(self, instance, validated_data):
+        instance.pen_name = validated_data.get("pen_name", instance.pen_name)
+        # the counters are kept with update() queries (stories/counters.py), never write them back from this copy
+        instance.save(update_fields=["pen_name"])
+        return instance
+
+
+class AuthorStatsSerializer(serializers.ModelSerializer):
+    mean_rating = serializers.DecimalField(max_digits=3, decimal_places=2, read_only=True)
+
+    class Meta:
+        model = Author
+        fields = [
+            'pen_name', 'total_stories', 'total_likes', 'total_dislikes',
+            'total_reviews', 'total_ratings', 'mean_rating',
+        ]
+        read_only_fields = fields
+
 class ProfileSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -66,6 +85,8 @@ class ProfileSerializer(serializers.ModelSerializer):
 
 
 class LoginSerializer(TokenObtainPairSerializer):
+    token_class = RefreshToken
+
     def validate(self, attrs):
         data = super().validate(attrs) 
 
@@ -73,6 +94,11 @@ class LoginSerializer(TokenObtainPairSerializer):
         data['role'] = self.user.role
 
         return data
+
+
+class RefreshSerializer(TokenRefreshSerializer):
+    # blacklist checks against Redis (see accounts/tokens.py)
+    token_class = RefreshToken
     
 
 class UserRoleUpdateSerializer(serializers.Serializer):
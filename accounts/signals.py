@@ -0,0 +1,17 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .authentication import forget_user
+from .models import User, Author
+
+
+# profile, role, verification and password changes, and author profiles, all go through save()
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_cached_user(sender, instance, **kwargs):
+    forget_user(instance.pk)
+
+
+@receiver(post_save, sender=Author)
+@receiver(post_delete, sender=Author)
+def forget_cached_author(sender, instance, **kwargs):
+    forget_user(instance.user_id)
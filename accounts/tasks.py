@@ -1,4 +1,5 @@
 from celery import shared_task
+from .tokens import prune_tokens
 from .utils import send_verification_email, send_password_reset_email
 
 @shared_task
@@ -15,3 +16,8 @@ def send_password_reset_email_task(user_id, reset_link):
     User = get_user_model()
     user = User.objects.get(id=user_id)
     send_password_reset_email(user, reset_link)
+
+
+@shared_task
+def prune_expired_tokens():
+    return prune_tokens()
@@ -1,8 +1,15 @@
 import pytest
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.urls import reverse
+from django.utils import timezone
+from django_redis import get_redis_connection
 from rest_framework import status
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
 from unittest.mock import patch
+from .authentication import user_cache_key, user_version
+from .models import Author
+from .tokens import RefreshToken, blacklist_key, is_blacklisted, prune_tokens
 
 User = get_user_model()
 
@@ -357,4 +364,103 @@ class TestUpdateUserRoleView:
             'role': 'admin'
         }, format='json')
 
-        assert response.status_code == status.HTTP_401_UNAUTHORIZED
\ No newline at end of file
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+@pytest.mark.django_db
+class TestCachedJWTAuthentication:
+
+    def test_user_is_resolved_from_cache(self, api_client, tokens_for_user, django_assert_num_queries):
+        api_client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens_for_user['access']}")
+
+        api_client.get(reverse('profile'))
+
+        # the profile row read by the view, authentication doesn't query
+        with django_assert_num_queries(1):
+            response = api_client.get(reverse('profile'))
+
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_cached_user_holds_no_password(self, api_client, tokens_for_user, verified_user):
+        api_client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens_for_user['access']}")
+        api_client.get(reverse('profile'))
+
+        row = cache.get(user_cache_key(verified_user.pk, user_version(verified_user.pk)))
+
+        assert row["id"] == verified_user.pk and row["author_id"] is None
+        assert verified_user.password not in row.values()
+
+    def test_changes_invalidate_the_cached_user(
+            self,
+            api_client,
+            tokens_for_user,
+            verified_user,
+            django_capture_on_commit_callbacks,
+    ):
+        api_client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens_for_user['access']}")
+        api_client.get(reverse('profile'))
+
+        with django_capture_on_commit_callbacks(execute=True):
+            response = api_client.post(reverse('register-author'), {'pen_name': 'Satoshi'}, format='json')
+        assert response.status_code == status.HTTP_201_CREATED
+
+        # the author profile is visible to the permission checks on the next request
+        response = api_client.get(reverse('author-stats'))
+        assert response.status_code == status.HTTP_200_OK
+
+        with django_capture_on_commit_callbacks(execute=True):
+            verified_user.is_verified = False
+            verified_user.save(update_fields=['is_verified'])
+
+        response = api_client.get(reverse('author-stats'))
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_author_update_keeps_counters(self, api_client, tokens_for_user, verified_user):
+        author = Author.objects.create(user=verified_user, pen_name='Satoshi')
+        api_client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens_for_user['access']}")
+        api_client.get(reverse('author-stats'))
+
+        # counters move with update() queries, which leave the cached user and author as they were
+        Author.objects.filter(pk=author.pk).update(total_likes=1, total_reviews=2, rating_sum=9)
+
+        response = api_client.patch(reverse('fetch-or-update-author-info'), {'pen_name': 'Nakamoto'}, format='json')
+        assert response.status_code == status.HTTP_200_OK
+
+        author.refresh_from_db()
+        assert author.pen_name == 'Nakamoto'
+        assert (author.total_likes, author.total_reviews, author.rating_sum) == (1, 2, 9)
+
+
+@pytest.mark.django_db
+class TestTokenBlacklist:
+
+    def test_rotated_token_is_rejected(self, api_client, tokens_for_user):
+        response = api_client.post(reverse('refresh-token'), {'refresh': tokens_for_user['refresh']}, format='json')
+        assert response.status_code == status.HTTP_200_OK
+
+        response = api_client.post(reverse('refresh-token'), {'refresh': tokens_for_user['refresh']}, format='json')
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_evicted_entries_fall_back_to_the_database(self, tokens_for_user, django_assert_num_queries):
+        token = RefreshToken(tokens_for_user['refresh'])
+        token.blacklist()
+
+        with django_assert_num_queries(0):
+            assert is_blacklisted(token['jti'])
+
+        # the Redis entry is evicted with the rest of the cache, the token stays revoked
+        get_redis_connection("default").delete(blacklist_key(token['jti']))
+
+        with django_assert_num_queries(2):
+            assert is_blacklisted(token['jti'])
+            assert not is_blacklisted('unknown')
+
+    def test_prune_deletes_expired_tokens(self, verified_user, tokens_for_user):
+        expired = RefreshToken.for_user(verified_user)
+        expired.blacklist()
+        OutstandingToken.objects.filter(jti=expired['jti']).update(expires_at=timezone.now())
+
+        assert prune_tokens(batch_size=1) == 1
+        assert list(OutstandingToken.objects.values_list('jti', flat=True)) == [
+            RefreshToken(tokens_for_user['refresh'])['jti']
+        ]
+        assert not BlacklistedToken.objects.exists()
@@ -0,0 +1,75 @@
+"""
+Refresh token blacklist in Redis, in front of the database.
+
+- blacklisting a token still writes its OutstandingToken/BlacklistedToken rows (the durable record), and also
+  sets auth:blacklist:<jti> in Redis, expiring with the token
+- a key found in Redis rejects the token without a query. A missing key proves nothing, it may have been evicted
+  with the rest of the cache, so the database answers then: the check never fails open
+- prune_tokens() (celery beat) deletes expired rows in chunks, an expired token is rejected by its exp claim
+  anyway, so the tables only hold tokens that can still be used
+"""
+
+import time
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from django_redis import get_redis_connection
+from rest_framework_simplejwt import tokens
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+
+PRUNE_BATCH_SIZE = 1000
+
+
+def blacklist_key(jti):
+    return f"auth:blacklist:{jti}"
+
+
+def remember_blacklisted(entries, redis=None):
+    """
+    Adds (jti, exp) pairs to the Redis blacklist, each expiring when its token does.
+    """
+    redis = redis or get_redis_connection("default")
+    now = int(time.time())
+
+    pipe = redis.pipeline(transaction=False)
+    for jti, exp in entries:
+        if exp > now:
+            pipe.set(blacklist_key(jti), 1, ex=exp - now)
+    pipe.execute()
+
+
+def is_blacklisted(jti):
+    if get_redis_connection("default").exists(blacklist_key(jti)):
+        return True
+
+    return BlacklistedToken.objects.filter(token__jti=jti).exists()
+
+
+def prune_tokens(batch_size=PRUNE_BATCH_SIZE):
+    expired = OutstandingToken.objects.filter(expires_at__lte=timezone.now()).order_by("pk")
+    pruned = 0
+
+    while True:
+        token_ids = list(expired.values_list("pk", flat=True)[:batch_size])
+        if not token_ids:
+            break
+
+        BlacklistedToken.objects.filter(token_id__in=token_ids).delete()
+        OutstandingToken.objects.filter(pk__in=token_ids).delete()
+        pruned += len(token_ids)
+
+    return pruned
+
+
+class RefreshToken(tokens.RefreshToken):
+
+    def check_blacklist(self):
+        if is_blacklisted(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_("Token is blacklisted"))
+
+    def blacklist(self):
+        blacklisted = super().blacklist()
+        remember_blacklisted([(self.payload[api_settings.JTI_CLAIM], self.payload["exp"])])
+        return blacklisted
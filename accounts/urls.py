@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import RegisterView, SendVerificationEmailView, VerifyEmailView, RequestPasswordResetView, PasswordResetConfirmView, AuthorView, RegisterAuthorView, LogoutView, LoginView, ProfileView, UpdateUserRoleView
+from .views import RegisterView, SendVerificationEmailView, VerifyEmailView, RequestPasswordResetView, PasswordResetConfirmView, AuthorView, AuthorStatsView, PublicAuthorStatsView, RegisterAuthorView, LogoutView, LoginView, ProfileView, UpdateUserRoleView
 from rest_framework_simplejwt.views import TokenRefreshView
 
 
@@ -15,5 +15,8 @@ urlpatterns = [
     path("reset/<uid>/<token>/", PasswordResetConfirmView.as_view(), name='confirm-password-reset'),
     path("register-author/", RegisterAuthorView.as_view(), name="register-author"),
     path("authors/me/", AuthorView.as_view(), name="fetch-or-update-author-info"),
+    # matched first, "me" is never a pen name (AuthorSerializer requires at least 3 characters)
+    path("authors/me/stats/", AuthorStatsView.as_view(), name="author-stats"),
+    path("authors/<str:pen_name>/stats/", PublicAuthorStatsView.as_view(), name="public-author-stats"),
     path("users/role/", UpdateUserRoleView.as_view(), name="update-user-role")
 ]
\ No newline at end of file
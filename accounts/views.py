@@ -2,14 +2,15 @@ import os
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
-from .serializers import RegisterSerializer, AuthorSerializer, ProfileSerializer, LoginSerializer, UserRoleUpdateSerializer
+from django.shortcuts import get_object_or_404
+from .serializers import RegisterSerializer, AuthorSerializer, AuthorStatsSerializer, ProfileSerializer, LoginSerializer, UserRoleUpdateSerializer
+from .tokens import RefreshToken
 from .tasks import send_password_reset_email_task, send_verification_email_task
 from .utils import generate_token, verify_token
-from .models import  User
+from .models import  User, Author
 from .permissions import IsVerified, IsSuperuser
 from .throttles import PasswordResetThrottle, LoginThrottle, EmailVerifyThrottle
 
@@ -142,7 +143,28 @@ class AuthorView(generics.RetrieveUpdateAPIView):
     permission_classes = [IsVerified]
 
     def get_object(self):
-        return self.request.user.author
+        return get_object_or_404(Author, user=self.request.user)
+
+
+"""
+Author dashboard stats, read from the counters kept on the Author row (see stories/counters.py), so a stats
+request is one primary key or pen name lookup however many stories, reactions and reviews the author has.
+"""
+
+class AuthorStatsView(generics.RetrieveAPIView):
+    serializer_class = AuthorStatsSerializer
+    permission_classes = [IsVerified]
+
+    def get_object(self):
+        return get_object_or_404(Author, user=self.request.user)
+
+
+class PublicAuthorStatsView(generics.RetrieveAPIView):
+    serializer_class = AuthorStatsSerializer
+    permission_classes = [permissions.AllowAny]
+
+    def get_object(self):
+        return get_object_or_404(Author, pen_name__iexact=self.kwargs["pen_name"])
 
 class RegisterAuthorView(generics.CreateAPIView):
     serializer_class = AuthorSerializer
@@ -198,7 +220,7 @@ class ProfileView(generics.RetrieveUpdateAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
-        return self.request.user
+        return get_object_or_404(User, pk=self.request.user.pk)
     
 class UpdateUserRoleView(generics.GenericAPIView):
     serializer_class = UserRoleUpdateSerializer
@@ -45,6 +45,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.shedding.LoadSheddingMiddleware',
 ]
 
 EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
@@ -137,9 +138,22 @@ CSRF_COOKIE_HTTPONLY = True
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.CachedJWTAuthentication',
     ),
 
+    "DEFAULT_RENDERER_CLASSES": [
+        "core.renderers.ORJSONRenderer",
+        "core.renderers.MessagePackRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+
+    "DEFAULT_PARSER_CLASSES": [
+        "core.parsers.ORJSONParser",
+        "core.parsers.MessagePackParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
+
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
 
@@ -150,8 +164,8 @@ REST_FRAMEWORK = {
     ],
 
     "DEFAULT_THROTTLE_CLASSES": [
-     'rest_framework.throttling.UserRateThrottle',
-        'rest_framework.throttling.AnonRateThrottle',
+     'core.throttling.UserRateThrottle',
+        'core.throttling.AnonRateThrottle',
     ],
 
     'DEFAULT_THROTTLE_RATES': {
@@ -193,16 +207,23 @@ SIMPLE_JWT = {
     "REFRESH_TOKEN_LIFETIME": timedelta(days=7),
     "ROTATE_REFRESH_TOKENS": True,
     "BLACKLIST_AFTER_ROTATION": True,
+    "TOKEN_REFRESH_SERIALIZER": "accounts.serializers.RefreshSerializer",
 }
 
 
 CACHES = {
     "default": {
-        "BACKEND": "django_redis.cache.RedisCache",
+        "BACKEND": "core.cache.L1RedisCache",
         "LOCATION": "redis://127.0.0.1:6379/1",
         "OPTIONS": {
             "CLIENT_CLASS": "django_redis.client.DefaultClient",
-        }
+        },
+        # in-process LRU in front of Redis for the hottest story reads, see core/cache.py
+        "L1": {
+            "MAX_ENTRIES": 256,
+            "TTL": 5,
+            "KEY_PREFIXES": ["stories:list:", "stories:tag:", "story:", "reviews:stamp:", "auth:user:"],
+        },
     }
 }
 
@@ -227,6 +248,38 @@ LOGGING = {
 CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', 'redis://localhost:6379/0')
 CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND', 'redis://localhost:6379/0')
 
+CELERY_BEAT_SCHEDULE = {
+    "flush-story-counters": {
+        "task": "stories.tasks.flush_story_counters",
+        "schedule": timedelta(seconds=5),
+    },
+    "compact-trending-scores": {
+        "task": "stories.tasks.compact_trending_scores",
+        "schedule": timedelta(hours=1),
+    },
+    "reconcile-author-stats": {
+        "task": "stories.tasks.reconcile_author_stats",
+        "schedule": timedelta(hours=6),
+    },
+    "prune-expired-tokens": {
+        "task": "accounts.tasks.prune_expired_tokens",
+        "schedule": timedelta(hours=1),
+    },
+}
+
+# Buffer like/dislike deltas in Redis and flush them to the database in batches (stories/counters.py)
+STORY_COUNTERS_WRITE_BEHIND = os.getenv('STORY_COUNTERS_WRITE_BEHIND', 'False').lower() == 'true'
+
+# Seconds an expired story list page may still be served while one worker rebuilds it, 0 disables (core/stampede.py)
+STORY_LIST_STALE_TTL = int(os.getenv('STORY_LIST_STALE_TTL') or 0)
+
+# Refuse low priority requests (search, deep pages, reviews) with a 503 while their view is overloaded (core/shedding.py)
+LOAD_SHEDDING = {
+    "ENABLED": (os.getenv('LOAD_SHEDDING_ENABLED') or 'False').lower() == 'true',
+    "MAX_IN_FLIGHT": int(os.getenv('LOAD_SHEDDING_MAX_IN_FLIGHT') or 32),
+    "MAX_P95": float(os.getenv('LOAD_SHEDDING_MAX_P95') or 2.0),
+}
+
 
 
 
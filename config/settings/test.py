@@ -9,9 +9,22 @@ PASSWORD_HASHERS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.CachedJWTAuthentication',
     ),
 
+    "DEFAULT_RENDERER_CLASSES": [
+        "core.renderers.ORJSONRenderer",
+        "core.renderers.MessagePackRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+
+    "DEFAULT_PARSER_CLASSES": [
+        "core.parsers.ORJSONParser",
+        "core.parsers.MessagePackParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
+
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
 
@@ -22,8 +35,8 @@ REST_FRAMEWORK = {
     ],
 
     "DEFAULT_THROTTLE_CLASSES": [
-     'rest_framework.throttling.UserRateThrottle',
-        'rest_framework.throttling.AnonRateThrottle',
+     'core.throttling.UserRateThrottle',
+        'core.throttling.AnonRateThrottle',
     ],
 
     'DEFAULT_THROTTLE_RATES': {
@@ -0,0 +1,276 @@
+"""
+Two level cache: a small in-process LRU/TTL (L1) in front of Redis (L2).
+
+- only keys under L1["KEY_PREFIXES"] are kept in L1 (story pages, list generations, stamps), at most
+  L1["MAX_ENTRIES"] of them, each for at most L1["TTL"] seconds
+- every write through this backend to such a key drops it from the local L1 and is published on a Redis
+  channel, every worker subscribes to it and drops the key from its own L1
+- a worker ignores its own messages, it has already evicted the keys (and may have cached fresher values since)
+- a lost message (subscriber reconnecting) can only leave a worker stale for TTL seconds, the subscriber also
+  empties its L1 whenever it reconnects
+- mutable values are kept pickled and unpickled per hit so callers can't change the cached copy
+"""
+
+import json
+import logging
+import os
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from django_redis.cache import RedisCache
+
+
+logger = logging.getLogger(__name__)
+
+
+CHANNEL = "cache:l1:invalidate"
+CLEAR_ALL = "*"
+
+DEFAULT_L1 = {
+    "MAX_ENTRIES": 256,
+    "TTL": 5,
+    "KEY_PREFIXES": (),
+}
+
+IMMUTABLE_TYPES = (int, float, str, bytes, bool, type(None))
+
+
+def _is_immutable(value):
+    if isinstance(value, tuple):
+        return all(isinstance(item, IMMUTABLE_TYPES) for item in value)
+    return isinstance(value, IMMUTABLE_TYPES)
+
+
+class LocalLRU:
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+        # bumped by every invalidation, a value read from Redis is only kept if no invalidation ran meanwhile
+        self.epoch = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+
+            expires_at, pickled, value = entry
+            if expires_at < time.monotonic():
+                del self.entries[key]
+                return None
+
+            self.entries.move_to_end(key)
+
+        return pickle.loads(value) if pickled else value
+
+    def set(self, key, value, epoch):
+        pickled = not _is_immutable(value)
+        if pickled:
+            value = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+        with self.lock:
+            if epoch != self.epoch:
+                return
+
+            self.entries[key] = (time.monotonic() + self.ttl, pickled, value)
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def evict(self, keys):
+        with self.lock:
+            self.epoch += 1
+            for key in keys:
+                self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.epoch += 1
+            self.entries.clear()
+
+
+class L1RedisCache(RedisCache):
+    def __init__(self, server, params):
+        super().__init__(server, params)
+
+        options = {**DEFAULT_L1, **params.get("L1", {})}
+        self.l1_prefixes = tuple(options["KEY_PREFIXES"])
+        self.l1 = LocalLRU(options["MAX_ENTRIES"], options["TTL"])
+        self._subscriber_pid = None
+        self._subscriber_lock = threading.Lock()
+        self._instance_id = uuid.uuid4().hex
+
+    def l1_eligible(self, key):
+        return bool(self.l1_prefixes) and isinstance(key, str) and key.startswith(self.l1_prefixes)
+
+    # reads
+
+    def get(self, key, default=None, version=None, client=None):
+        if version is not None or not self.l1_eligible(key):
+            return super().get(key, default, version, client)
+
+        value = self.l1.get(key)
+        if value is not None:
+            return value
+
+        self._ensure_subscriber()
+        epoch = self.l1.epoch
+        value = super().get(key, None, version, client)
+
+        if value is None:
+            return default
+
+        self.l1.set(key, value, epoch)
+        return value
+
+    def get_many(self, keys, version=None, client=None):
+        keys = list(keys)
+        if version is not None:
+            return super().get_many(keys, version=version, client=client)
+
+        found = {}
+        for key in keys:
+            if self.l1_eligible(key):
+                value = self.l1.get(key)
+                if value is not None:
+                    found[key] = value
+
+        missing = [key for key in keys if key not in found]
+        if missing:
+            self._ensure_subscriber()
+            epoch = self.l1.epoch
+            fetched = super().get_many(missing, client=client)
+
+            for key, value in fetched.items():
+                if self.l1_eligible(key):
+                    self.l1.set(key, value, epoch)
+
+            found.update(fetched)
+
+        return found
+
+    # writes
+
+    def set(self, key, *args, **kwargs):
+        try:
+            return super().set(key, *args, **kwargs)
+        finally:
+            self._invalidate([key])
+
+    def add(self, key, *args, **kwargs):
+        added = super().add(key, *args, **kwargs)
+        if added:
+            self._invalidate([key])
+        return added
+
+    def set_many(self, data, *args, **kwargs):
+        try:
+            return super().set_many(data, *args, **kwargs)
+        finally:
+            self._invalidate(list(data))
+
+    def delete(self, key, *args, **kwargs):
+        try:
+            return super().delete(key, *args, **kwargs)
+        finally:
+            self._invalidate([key])
+
+    def delete_many(self, keys, *args, **kwargs):
+        keys = list(keys)
+        try:
+            return super().delete_many(keys, *args, **kwargs)
+        finally:
+            self._invalidate(keys)
+
+    def incr(self, key, *args, **kwargs):
+        try:
+            return super().incr(key, *args, **kwargs)
+        finally:
+            self._invalidate([key])
+
+    def decr(self, key, *args, **kwargs):
+        try:
+            return super().decr(key, *args, **kwargs)
+        finally:
+            self._invalidate([key])
+
+    def delete_pattern(self, *args, **kwargs):
+        try:
+            return super().delete_pattern(*args, **kwargs)
+        finally:
+            self._invalidate([CLEAR_ALL])
+
+    def clear(self):
+        try:
+            return super().clear()
+        finally:
+            self._invalidate([CLEAR_ALL])
+
+    # invalidation
+
+    def _invalidate(self, keys):
+        keys = [key for key in keys if key == CLEAR_ALL or self.l1_eligible(key)]
+        if not keys:
+            return
+
+        self._evict(keys)
+
+        try:
+            self.client.get_client().publish(CHANNEL, json.dumps({"sender": self._sender(), "keys": keys}))
+        except Exception:
+            logger.exception("Publishing L1 cache invalidations failed")
+
+    def _sender(self):
+        # a forked worker inherits the instance, the pid tells it apart
+        return f"{self._instance_id}:{os.getpid()}"
+
+    def _evict(self, keys):
+        if CLEAR_ALL in keys:
+            self.l1.clear()
+        else:
+            self.l1.evict(keys)
+
+    def _ensure_subscriber(self):
+        # one subscriber thread per process, started again in a worker forked after it was started
+        if self._subscriber_pid == os.getpid():
+            return
+
+        with self._subscriber_lock:
+            if self._subscriber_pid == os.getpid():
+                return
+
+            self.l1.clear()
+            pubsub = self._subscribe()
+            threading.Thread(target=self._listen, args=(pubsub,), name="l1-cache-invalidation", daemon=True).start()
+            self._subscriber_pid = os.getpid()
+
+    def _subscribe(self):
+        pubsub = self.client.get_client().pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(CHANNEL)
+        return pubsub
+
+    def _listen(self, pubsub):
+        while True:
+            try:
+                for message in pubsub.listen():
+                    if message["type"] == "message":
+                        invalidation = json.loads(message["data"])
+                        if invalidation["sender"] != self._sender():
+                            self._evict(invalidation["keys"])
+            except Exception:
+                logger.warning("L1 cache invalidation subscriber disconnected, reconnecting", exc_info=True)
+
+            # messages may have been missed while disconnected
+            self.l1.clear()
+            time.sleep(1)
+
+            try:
+                pubsub = self._subscribe()
+            except Exception:
+                logger.warning("L1 cache invalidation subscriber failed to reconnect", exc_info=True)
@@ -0,0 +1,41 @@
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+def make_etag(*parts, weak=False):
+    etag = '"%s"' % "-".join(str(part) for part in parts)
+    return f"W/{etag}" if weak else etag
+
+
+def stamp_to_timestamp(stamp):
+    # stamps are time.time_ns() values, Last-Modified only has second precision
+    return stamp // 1_000_000_000
+
+
+def validators_for(request, stamp, *parts, weak=False):
+    """
+    ETag and Last-Modified for a resource version, the renderer format is part of the ETag
+    because the same version is served as different bytes per format. Resources whose version may also go out
+    gzipped or not (core/responses.py) take a weak ETag, a strong one names a single content coding.
+    """
+    etag = make_etag(*parts, stamp, request.accepted_renderer.format, weak=weak)
+    return etag, stamp_to_timestamp(stamp)
+
+
+def set_validators(response, etag, last_modified):
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    return response
+
+
+def conditional_response(request, etag, last_modified):
+    """
+    Returns a 304 (or 412) response when the request's preconditions match the given validators,
+    otherwise None and the view builds the full response.
+    """
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+    if response is not None and response.status_code == 304:
+        set_validators(response, etag, last_modified)
+
+    return response
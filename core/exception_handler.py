@@ -1,5 +1,6 @@
 from rest_framework.views import exception_handler
 from rest_framework.exceptions import Throttled
+from .shedding import ServiceOverloaded
 
 def custom_exception_handler(exc, context):
     response = exception_handler(exc, context)
@@ -10,5 +11,12 @@ def custom_exception_handler(exc, context):
             "message": "Too many requests. Please slow down.",
             "retry_after": f"{exc.wait} seconds",
         }
+
+    if isinstance(exc, ServiceOverloaded):
+        response.data = {
+            "error": "service_overloaded",
+            "message": "The service is busy. Please retry later.",
+            "retry_after": f"{exc.wait} seconds",
+        }
     
     return response
\ No newline at end of file
@@ -0,0 +1,22 @@
+from rest_framework.response import Response
+from .serializers import ValuesPlan
+
+
+class ValuesListModelMixin:
+    """
+    list() that renders the serializer's fields from queryset.values() rows through a ValuesPlan,
+    same response as ListModelMixin.list without building a model instance or running the serializer per row.
+
+    values_extra_columns are selected on top of the serialized ones (e.g. keyset pagination fields).
+    """
+    values_extra_columns = ()
+
+    def list(self, request, *args, **kwargs):
+        plan = ValuesPlan(self.get_serializer())
+        queryset = plan.values(self.filter_queryset(self.get_queryset()), *self.values_extra_columns)
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(plan.to_representation(page))
+
+        return Response(plan.to_representation(queryset))
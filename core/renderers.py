@@ -0,0 +1,79 @@
+"""
+Renderers for the API.
+
+- ORJSONRenderer: same output as DRF's JSONRenderer (compact, UTF-8) encoded by orjson,
+  datetimes and UUIDs are encoded natively, Decimal becomes a float like DRF's encoder does
+- MessagePackRenderer: the same data as compact binary for the mobile apps, picked with
+  `Accept: application/msgpack` or `?format=msgpack`, datetimes become msgpack timestamps
+"""
+
+import datetime
+import decimal
+import uuid
+import msgpack
+import orjson
+from django.db.models.query import QuerySet
+from django.utils.functional import Promise
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+
+def encode_default(obj):
+    # types neither orjson nor msgpack encode themselves, mirrors rest_framework.utils.encoders.JSONEncoder
+    if isinstance(obj, decimal.Decimal):
+        # serializer DecimalFields already render strings (COERCE_DECIMAL_TO_STRING), raw values become floats
+        return float(obj)
+    if isinstance(obj, Promise):
+        return str(obj)
+    if isinstance(obj, datetime.timedelta):
+        return str(obj.total_seconds())
+    if isinstance(obj, QuerySet):
+        return list(obj)
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    if hasattr(obj, "__iter__"):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not serializable")
+
+
+class ORJSONRenderer(JSONRenderer):
+    options = orjson.OPT_NON_STR_KEYS
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+
+        options = self.options
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            options |= orjson.OPT_INDENT_2
+
+        ret = orjson.dumps(data, default=encode_default, option=options)
+
+        # like DRF, keep the output a strict javascript subset
+        if b"\xe2\x80\xa8" in ret or b"\xe2\x80\xa9" in ret:
+            ret = ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+
+        return ret
+
+
+def msgpack_default(obj):
+    if isinstance(obj, datetime.datetime) and obj.tzinfo is None:
+        return obj.isoformat()
+    if isinstance(obj, (datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    return encode_default(obj)
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+
+        # aware datetimes are packed as the msgpack timestamp extension type
+        return msgpack.packb(data, default=msgpack_default, datetime=True)
@@ -0,0 +1,62 @@
+"""
+Cached response bodies.
+
+- pack_body() takes a rendered response and keeps its bytes and content type, bodies of COMPRESS_MIN_LENGTH bytes
+  or more are gzipped once when stored instead of on every hit
+- body_response() serves a packed body as is: no unpickling of response data and no rendering, gzipped bodies
+  go out with Content-Encoding: gzip to clients that accept it and are decompressed for the others
+"""
+
+import gzip
+import logging
+import re
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+
+
+logger = logging.getLogger(__name__)
+
+COMPRESS_MIN_LENGTH = 1024
+
+re_accepts_gzip = re.compile(r"\bgzip\b")
+
+
+def pack_body(response):
+    body, encoding = response.content, None
+
+    if len(body) >= COMPRESS_MIN_LENGTH:
+        body, encoding = compress_string(body), "gzip"
+
+    return response["Content-Type"], encoding, body
+
+
+def body_response(request, content_type, encoding, body):
+    if encoding == "gzip" and not re_accepts_gzip.search(request.META.get("HTTP_ACCEPT_ENCODING", "")):
+        body, encoding = gzip.decompress(body), None
+
+    response = HttpResponse(body, content_type=content_type)
+    if encoding:
+        response["Content-Encoding"] = encoding
+
+    patch_vary_headers(response, ["Accept-Encoding"])
+    return response
+
+
+def call_after_response(response, func):
+    """
+    Runs func once the response has been sent (the server closes the response after the last byte is written),
+    the client doesn't wait for it. It runs before request_finished, while the request's database connection is
+    still open, and its exceptions are logged, never raised into the server.
+    """
+    close = response.close
+
+    def close_after(*args, **kwargs):
+        try:
+            func()
+        except Exception:
+            logger.exception("Post-response task failed")
+        close(*args, **kwargs)
+
+    response.close = close_after
+    return response
@@ -0,0 +1,92 @@
+"""
+Sparse fieldsets for read responses.
+
+- ?fields=title,likes keeps only the listed fields, ?omit=content drops the listed fields
+- id is always kept, clients and cache merges need it to identify the object
+- only GET requests are affected, writes always validate and return the full representation
+- unknown field names are ignored
+"""
+
+
+def requested_fields(request):
+    if request is None or request.method != "GET":
+        return None, set()
+
+    def parse(param):
+        value = request.query_params.get(param)
+        if value is None:
+            return None
+        return {name.strip() for name in value.split(",") if name.strip()}
+
+    return parse("fields"), parse("omit") or set()
+
+
+def sparse_fieldset(data, request):
+    """
+    Applies ?fields= / ?omit= to an already serialized dict, for representations served from the cache.
+    """
+    fields, omit = requested_fields(request)
+    if fields is None and not omit:
+        return data
+
+    return {
+        name: value for name, value in data.items()
+        if name == "id" or ((fields is None or name in fields) and name not in omit)
+    }
+
+
+class SparseFieldsetsMixin:
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        fields, omit = requested_fields(self.context.get("request"))
+
+        for name in list(self.fields):
+            if name == "id":
+                continue
+            if (fields is not None and name not in fields) or name in omit:
+                self.fields.pop(name)
+
+
+class ValuesPlan:
+    """
+    Read path for list endpoints that skips model instances and the serializer field machinery.
+
+    - compiled once per request from the serializer's readable fields: each becomes a (name, values() column,
+      field.to_representation) entry, related sources are followed with a join (author.pen_name -> author__pen_name)
+    - rows come from queryset.values(*plan.columns) and every value goes through the same to_representation
+      the serializer would call, so the rendered JSON is byte-identical
+    - a missing related object (null foreign key) leaves the field out, like the serializer does
+    """
+    def __init__(self, serializer):
+        self.entries = []
+
+        for field in serializer._readable_fields:
+            if field.source == "*":
+                raise ValueError(f"{field.field_name} has no column, it can't be read from values()")
+            column = field.source.replace(".", "__")
+            self.entries.append((field.field_name, column, field.to_representation, "." in field.source))
+
+        self.columns = list(dict.fromkeys(column for _, column, _, _ in self.entries))
+
+    def values(self, queryset, *extra_columns):
+        # annotations and extra selects (search_rank) stay selected so the ordering can use them
+        extra = [*queryset.query.extra_select, *queryset.query.annotation_select]
+        return queryset.values(*dict.fromkeys([*self.columns, *extra_columns, *extra]))
+
+    def to_representation(self, rows):
+        results = []
+
+        for row in rows:
+            item = {}
+            for name, column, to_representation, related in self.entries:
+                value = row[column]
+                if value is None:
+                    if related:
+                        continue
+                    item[name] = None
+                else:
+                    item[name] = to_representation(value)
+            results.append(item)
+
+        return results
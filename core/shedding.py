@@ -0,0 +1,147 @@
+"""
+Adaptive load shedding: low priority requests are refused early (503 + Retry-After) while their view is overloaded.
+
+- LoadSheddingMiddleware tracks, per view and action, the requests in flight and the latency of the last
+  LOAD_SHEDDING["SAMPLES"] requests of this process finished in the last WINDOW seconds
+- a view is overloaded while it has MAX_IN_FLIGHT requests in flight, or the p95 of its recent latencies is
+  above MAX_P95 seconds (once it has MIN_SAMPLES of them)
+- views opt in with LoadSheddingMixin and say which requests are low priority (search, deep pages, review lists),
+  those are refused before authentication or any query, through the exception handler. A view may serve them
+  from its cache instead (see StoryViewSet.list)
+- refused requests are not timed. Samples older than WINDOW seconds are dropped, so a view whose requests are all
+  low priority stops shedding once its slow samples expire, and the requests let through then measure it again
+- both counts are per process: under sync workers a process never has more than one request in flight, so only
+  the p95 can trip there, MAX_IN_FLIGHT needs threaded or async workers
+- off by default, LOAD_SHEDDING["ENABLED"] turns it on
+"""
+
+import threading
+import time
+from collections import defaultdict, deque
+from django.conf import settings
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+DEFAULT_LOAD_SHEDDING = {
+    "ENABLED": False,
+    "MAX_IN_FLIGHT": 32,
+    "MAX_P95": 2.0,
+    "SAMPLES": 200,
+    "MIN_SAMPLES": 20,
+    "WINDOW": 60,
+    "RETRY_AFTER": 5,
+}
+
+
+def shedding_settings():
+    return {**DEFAULT_LOAD_SHEDDING, **getattr(settings, "LOAD_SHEDDING", {})}
+
+
+class ServiceOverloaded(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "The service is busy, please retry later."
+    default_code = "service_overloaded"
+
+    def __init__(self, wait, detail=None, code=None):
+        super().__init__(detail, code)
+        self.wait = wait
+
+
+class ViewLoad:
+    def __init__(self, samples):
+        self.in_flight = 0
+        # (finished at, latency)
+        self.samples = deque(maxlen=samples)
+        self.lock = threading.Lock()
+
+    def start(self):
+        with self.lock:
+            self.in_flight += 1
+
+    def finish(self, latency=None):
+        with self.lock:
+            self.in_flight -= 1
+            if latency is not None:
+                self.samples.append((time.monotonic(), latency))
+
+    def latencies(self, window):
+        """
+        The latencies of the requests finished in the last window seconds, sorted, older samples are dropped.
+        """
+        horizon = time.monotonic() - window
+        with self.lock:
+            while self.samples and self.samples[0][0] < horizon:
+                self.samples.popleft()
+            return sorted(latency for _, latency in self.samples)
+
+    def overloaded(self, options):
+        if self.in_flight >= options["MAX_IN_FLIGHT"]:
+            return True
+
+        latencies = self.latencies(options["WINDOW"])
+        if len(latencies) < options["MIN_SAMPLES"]:
+            return False
+        return latencies[int(len(latencies) * 0.95)] > options["MAX_P95"]
+
+
+class LoadSheddingMixin:
+    # actions whose requests are all low priority, override is_low_priority() for finer rules
+    low_priority_actions = ()
+
+    @classmethod
+    def is_low_priority(cls, request, action):
+        return action in cls.low_priority_actions
+
+    def initial(self, request, *args, **kwargs):
+        self.check_load(request)
+        super().initial(request, *args, **kwargs)
+
+    def check_load(self, request):
+        """
+        Refuses a request the middleware marked for shedding, views with a cached fallback override it.
+        """
+        wait = getattr(request, "shed_load", None)
+        if wait is not None:
+            raise ServiceOverloaded(wait)
+
+
+def _view_action(request, view_func):
+    actions = getattr(view_func, "actions", None)
+    method = request.method.lower()
+
+    if actions:
+        return actions.get(method)
+    return method
+
+
+class LoadSheddingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.options = shedding_settings()
+        self.loads = defaultdict(lambda: ViewLoad(self.options["SAMPLES"]))
+        self.lock = threading.Lock()
+
+    def __call__(self, request):
+        try:
+            return self.get_response(request)
+        finally:
+            load, started = getattr(request, "_view_load", (None, None))
+            if load is not None:
+                load.finish(None if hasattr(request, "shed_load") else time.monotonic() - started)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, "cls", None)
+        if not self.options["ENABLED"] or view_class is None or not issubclass(view_class, LoadSheddingMixin):
+            return None
+
+        action = _view_action(request, view_func)
+        with self.lock:
+            load = self.loads[f"{view_class.__name__}.{action}"]
+
+        if load.overloaded(self.options) and view_class.is_low_priority(request, action):
+            request.shed_load = self.options["RETRY_AFTER"]
+
+        load.start()
+        request._view_load = (load, time.monotonic())
+        return None
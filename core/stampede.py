@@ -0,0 +1,74 @@
+"""
+Cache stampede protection.
+
+- single flight: the first worker to miss takes a short lock (cache.add, atomic SET NX on Redis) and rebuilds,
+  the others wait for its entry instead of running the same query
+- probabilistic early refresh (XFetch): an entry stores when it expires and how long it took to build,
+  each hit recomputes it early with a probability that rises as expiry gets closer and the more costly the
+  build was, so a hot entry is rebuilt by one request before it expires instead of by all of them after
+- stale-while-revalidate: an entry kept past its expiry is still served while one worker rebuilds it
+"""
+
+import math
+import random
+import time
+from django.core.cache import cache
+
+
+LOCK_TIMEOUT = 10
+WAIT_TIMEOUT = 2.0
+POLL_INTERVAL = 0.05
+EARLY_REFRESH_BETA = 1.0
+
+
+def lock_key(key):
+    # outside the key's own prefix, so locks are never held in the in-process L1 cache (core/cache.py)
+    return f"lock:{key}"
+
+
+def acquire(key, timeout=LOCK_TIMEOUT):
+    return cache.add(lock_key(key), 1, timeout)
+
+
+def release(key):
+    cache.delete(lock_key(key))
+
+
+def wait_for(key, timeout=WAIT_TIMEOUT):
+    """
+    Polls for the entry another worker is building, None when it doesn't appear in time
+    or the builder gave up (its lock is gone and the entry is still missing).
+    """
+    deadline = time.monotonic() + timeout
+
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+
+        value = cache.get(key)
+        if value is not None:
+            return value
+
+        if cache.get(lock_key(key)) is None:
+            return None
+
+    return None
+
+
+def single_flight(key, build):
+    """
+    Returns build() when this worker holds the lock, otherwise the entry built by the lock holder,
+    falling back to building it here when that takes too long.
+    """
+    if acquire(key):
+        try:
+            return build()
+        finally:
+            release(key)
+
+    value = wait_for(key)
+    return value if value is not None else build()
+
+
+def refresh_due(expires_at, delta, beta=EARLY_REFRESH_BETA):
+    # 1 - random() is in (0, 1], so the log is defined and <= 0
+    return time.time() - delta * beta * math.log(1.0 - random.random()) >= expires_at
@@ -1,3 +1,294 @@
-from django.test import TestCase
+import datetime
+import time
+from decimal import Decimal
+import msgpack
+import pytest
+from django.core.cache import cache, caches
+from django.urls import reverse
+from django_redis import get_redis_connection
+from rest_framework import status
+from rest_framework.exceptions import ParseError
+from rest_framework.permissions import AllowAny
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework.views import APIView
+from io import BytesIO
+from .parsers import ORJSONParser, MessagePackParser
+from .renderers import ORJSONRenderer, MessagePackRenderer
+from . import stampede
+from .cache import L1RedisCache, LocalLRU
+from .stampede import acquire, release, lock_key, single_flight, refresh_due
+from .throttling import GCRAThrottle, AnonRateThrottle
+from . import shedding
+from .shedding import ViewLoad
 
-# Create your tests here.
+
+class TestRenderers:
+
+    def test_orjson_matches_drf_json(self):
+        data = {
+            "title": "Café   story",
+            "average_rating": Decimal("4.50"),
+            "created_at": "2026-10-17T10:00:00Z",
+            "tags": ("a", "b"),
+            "nested": [{"likes": 3, "ratio": 0.5, "missing": None}],
+        }
+
+        assert ORJSONRenderer().render(data) == JSONRenderer().render(data)
+
+    def test_orjson_encodes_datetimes_natively(self):
+        moment = datetime.datetime(2026, 10, 17, 10, 0, 0, tzinfo=datetime.timezone.utc)
+
+        assert ORJSONRenderer().render({"at": moment}) == b'{"at":"2026-10-17T10:00:00+00:00"}'
+
+    def test_msgpack_round_trip(self):
+        moment = datetime.datetime(2026, 10, 17, 10, 0, 0, tzinfo=datetime.timezone.utc)
+        data = {"id": 1, "average_rating": Decimal("4.50"), "created_at": moment}
+
+        packed = MessagePackRenderer().render(data)
+        parsed = MessagePackParser().parse(BytesIO(packed))
+
+        assert parsed == {"id": 1, "average_rating": 4.5, "created_at": moment}
+
+    def test_parsers_reject_invalid_payloads(self):
+        with pytest.raises(ParseError):
+            ORJSONParser().parse(BytesIO(b"{not json"))
+
+        with pytest.raises(ParseError):
+            MessagePackParser().parse(BytesIO(b"\xc1"))
+
+
+@pytest.mark.django_db
+class TestContentNegotiation:
+
+    def test_stories_list_as_msgpack(self, api_client, author, create_story):
+        _, author = author
+        story = create_story(author=author)
+
+        response = api_client.get(reverse("story-list"), HTTP_ACCEPT="application/msgpack")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response["Content-Type"] == "application/msgpack"
+        assert msgpack.unpackb(response.content)["results"][0]["title"] == story.title
+
+    def test_create_story_from_msgpack(self, api_client, author, story_data):
+        user, _ = author
+        api_client.force_authenticate(user=user)
+
+        response = api_client.post(
+            reverse("story-list"),
+            msgpack.packb(story_data),
+            content_type="application/msgpack",
+            HTTP_ACCEPT="application/json",
+        )
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.json()["title"] == story_data["title"]
+
+
+class TestStampede:
+
+    def test_single_flight_waits_for_the_lock_holder(self, monkeypatch):
+        cache.clear()
+        assert acquire("page")
+
+        # the other worker stores its entry while this one waits
+        monkeypatch.setattr(stampede.time, "sleep", lambda seconds: cache.set("page", "built elsewhere"))
+
+        assert single_flight("page", lambda: pytest.fail("built twice")) == "built elsewhere"
+
+    def test_single_flight_builds_when_the_holder_gives_up(self, monkeypatch):
+        cache.clear()
+        assert acquire("page")
+
+        monkeypatch.setattr(stampede.time, "sleep", lambda seconds: release("page"))
+
+        assert single_flight("page", lambda: "built here") == "built here"
+        assert cache.get(lock_key("page")) is None
+
+    def test_refresh_due(self):
+        now = time.time()
+
+        assert refresh_due(now - 1, delta=0.1)
+        assert not refresh_due(now + 3600, delta=0.01)
+
+
+class TestL1Cache:
+
+    def test_hot_keys_are_served_in_process(self):
+        cache.set("story:1", {"title": "Cached"})
+        assert cache.get("story:1") == {"title": "Cached"}
+
+        # written straight to Redis, without invalidation
+        super(L1RedisCache, caches["default"]).set("story:1", {"title": "Changed"})
+        assert cache.get("story:1") == {"title": "Cached"}
+
+        # keys outside the configured prefixes always go to Redis
+        cache.set("other:1", "a")
+        cache.get("other:1")
+        super(L1RedisCache, caches["default"]).set("other:1", "b")
+        assert cache.get("other:1") == "b"
+
+    def test_cached_values_are_copies(self):
+        cache.set("story:1", {"likes": 1})
+
+        cache.get("story:1")["likes"] = 100
+
+        assert cache.get("story:1") == {"likes": 1}
+
+    def test_writes_invalidate_other_workers(self):
+        worker = caches.create_connection("default")
+        cache.set("story:1", "v1")
+        assert worker.get("story:1") == "v1"
+
+        cache.set("story:1", "v2")
+
+        deadline = time.monotonic() + 2
+        while worker.get("story:1") != "v2" and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        assert worker.get("story:1") == "v2"
+
+    def test_lru_is_bounded(self):
+        lru = LocalLRU(max_entries=2, ttl=60)
+
+        for key in ("a", "b", "c"):
+            lru.set(key, key, lru.epoch)
+
+        assert lru.get("a") is None
+        assert lru.get("c") == "c"
+
+    def test_read_racing_an_invalidation_is_not_kept(self):
+        lru = LocalLRU(max_entries=2, ttl=60)
+
+        epoch = lru.epoch
+        lru.evict(["a"])
+        lru.set("a", "stale", epoch)
+
+        assert lru.get("a") is None
+
+
+class BurstThrottle(AnonRateThrottle):
+    scope = "test_burst"
+
+
+class SustainedThrottle(AnonRateThrottle):
+    scope = "test_sustained"
+
+
+class ThrottledView(APIView):
+    permission_classes = [AllowAny]
+    throttle_classes = [BurstThrottle, SustainedThrottle]
+
+    def get(self, request):
+        return Response({})
+
+
+class TestThrottling:
+
+    @pytest.fixture
+    def clock(self, monkeypatch):
+        monkeypatch.setitem(api_settings.DEFAULT_THROTTLE_RATES, "test_burst", "2/min")
+        monkeypatch.setitem(api_settings.DEFAULT_THROTTLE_RATES, "test_sustained", "3/hour")
+
+        now = [1_000_000.0]
+        monkeypatch.setattr(GCRAThrottle, "timer", lambda self: now[0])
+        return now
+
+    def request(self):
+        return ThrottledView.as_view()(APIRequestFactory().get("/"))
+
+    def test_scopes_are_checked_together(self, clock):
+        assert [self.request().status_code for _ in range(3)] == [200, 200, 429]
+
+        # the refused request used up neither scope, the burst frees a slot every 30 seconds
+        clock[0] += 30
+        assert self.request().status_code == status.HTTP_200_OK
+
+        clock[0] += 30
+        response = self.request()
+
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        assert response["Retry-After"] == "1140"
+
+    def test_state_is_one_value_per_scope(self, clock):
+        for _ in range(2):
+            self.request()
+
+        redis = get_redis_connection("default")
+
+        assert float(redis.get("throttle:test_burst:127.0.0.1")) == clock[0] + 60
+        assert float(redis.get("throttle:test_sustained:127.0.0.1")) == clock[0] + 2400
+        assert 0 < redis.pttl("throttle:test_burst:127.0.0.1") <= 60_000
+
+
+@pytest.mark.django_db
+class TestLoadShedding:
+
+    def test_low_priority_requests_are_shed(self, settings, author, create_story, review_url):
+        _, author = author
+        story = create_story(author=author, title="Dragons")
+        settings.LOAD_SHEDDING = {"ENABLED": True, "MAX_IN_FLIGHT": 0}
+        client = APIClient()
+
+        response = client.get(reverse("story-list"), {"search": "dragons"})
+
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert response["Retry-After"] == "5"
+        assert response.json()["error"] == "service_overloaded"
+        assert client.get(review_url(story.id)).status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+
+        # the rest of the list is not low priority
+        assert client.get(reverse("story-list")).status_code == status.HTTP_200_OK
+
+    def test_shed_list_pages_are_served_from_cache(self, settings, author, create_story):
+        _, author = author
+        create_story(author=author, title="Dragons")
+        APIClient().get(reverse("story-list"), {"search": "dragons"})
+
+        settings.LOAD_SHEDDING = {"ENABLED": True, "MAX_IN_FLIGHT": 0}
+        response = APIClient().get(reverse("story-list"), {"search": "dragons"})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["results"][0]["title"] == "Dragons"
+
+    def test_slow_views_are_overloaded(self):
+        options = {"MAX_IN_FLIGHT": 10, "MAX_P95": 1.0, "MIN_SAMPLES": 20, "WINDOW": 60}
+        load = ViewLoad(samples=100)
+
+        for latency in [0.1] * 90 + [3.0] * 4:
+            load.start()
+            load.finish(latency)
+        assert not load.overloaded(options)
+
+        for _ in range(2):
+            load.start()
+            load.finish(3.0)
+        assert load.overloaded(options)
+
+    def test_shed_views_recover_once_slow_samples_expire(self, settings, monkeypatch, author, create_story, review_url):
+        user, author = author
+        story = create_story(author=author)
+        settings.LOAD_SHEDDING = {"ENABLED": True, "MAX_P95": 0.5, "MIN_SAMPLES": 2, "WINDOW": 60}
+
+        # every clock reading is a second after the previous one, each request takes about a second
+        now = [0.0]
+
+        def monotonic():
+            now[0] += 1.0
+            return now[0]
+
+        monkeypatch.setattr(shedding, "time", type("Clock", (), {"monotonic": staticmethod(monotonic)}))
+        client = APIClient()
+        client.force_authenticate(user=user)
+
+        # every review list request is low priority, the refused ones are never timed
+        for _ in range(2):
+            assert client.get(review_url(story.id)).status_code == status.HTTP_200_OK
+        for _ in range(3):
+            assert client.get(review_url(story.id)).status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+
+        now[0] += 60
+        assert client.get(review_url(story.id)).status_code == status.HTTP_200_OK
@@ -0,0 +1,113 @@
+"""
+Rate limiting with GCRA (generic cell rate algorithm) in Redis, every scope of a request checked in one call.
+
+- a scope allowing N requests per period P lets a request through every P/N seconds, with bursts of up to N,
+  its whole state is one key per client: the theoretical arrival time (TAT) of its next request
+- the first throttle of a view to run checks every GCRA throttle of the view in one atomic Lua call and keeps the
+  result on the request, the others read it
+- a request is counted by every scope or by none, one scope refusing it doesn't use up the others
+- if Redis can't be reached the request is let through, rate limiting never takes the API down
+"""
+
+import logging
+from django_redis import get_redis_connection
+from rest_framework import throttling
+
+
+logger = logging.getLogger(__name__)
+
+
+# KEYS: one per scope. ARGV: now, then the emission interval and period of each key
+GCRA_SCRIPT = """
+local now = tonumber(ARGV[1])
+local tats = {}
+local waits = {}
+local denied = false
+
+for i = 1, #KEYS do
+    local interval = tonumber(ARGV[i * 2])
+    local period = tonumber(ARGV[i * 2 + 1])
+
+    local stored = redis.call('GET', KEYS[i])
+    local tat = stored and tonumber(stored) or now
+    if tat < now then
+        tat = now
+    end
+
+    tats[i] = tat + interval
+    local wait = tats[i] - period - now
+    if wait > 0 then
+        denied = true
+        waits[i] = tostring(wait)
+    else
+        waits[i] = '0'
+    end
+end
+
+if not denied then
+    for i = 1, #KEYS do
+        redis.call('SET', KEYS[i], tostring(tats[i]), 'PX', math.ceil((tats[i] - now) * 1000))
+    end
+end
+
+return waits
+"""
+
+
+def _request_waits(request, view):
+    """
+    Checks every GCRA throttle of the view once per request, returns the wait of each refusing throttle key.
+    """
+    waits = getattr(request, "_throttle_waits", None)
+    if waits is not None:
+        return waits
+
+    now = None
+    limits = {}
+    for throttle in view.get_throttles():
+        if isinstance(throttle, GCRAThrottle) and throttle.rate is not None:
+            key = throttle.get_cache_key(request, view)
+            if key is not None:
+                limits[key] = (throttle.duration / throttle.num_requests, throttle.duration)
+                now = now or throttle.timer()
+
+    waits = {}
+    if limits:
+        try:
+            redis = get_redis_connection("default")
+            results = redis.register_script(GCRA_SCRIPT)(
+                keys=list(limits),
+                args=[now] + [value for limit in limits.values() for value in limit],
+            )
+            waits = {key: float(wait) for key, wait in zip(limits, results) if float(wait) > 0}
+        except Exception:
+            logger.warning("Rate limiting skipped, Redis unavailable", exc_info=True)
+
+    request._throttle_waits = waits
+    return waits
+
+
+class GCRAThrottle(throttling.SimpleRateThrottle):
+    cache_format = "throttle:%(scope)s:%(ident)s"
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.remaining_wait = _request_waits(request, view).get(self.key)
+        return self.remaining_wait is None
+
+    def wait(self):
+        return self.remaining_wait
+
+
+class AnonRateThrottle(GCRAThrottle, throttling.AnonRateThrottle):
+    pass
+
+
+class UserRateThrottle(GCRAThrottle, throttling.UserRateThrottle):
+    pass
@@ -0,0 +1,246 @@
+"""
+Write stamps for conditional GETs.
+
+- a stamp is the time.time_ns() of the last write to a resource (a story, the reviews of a story, a built list page)
+- it is used both as the ETag version and as Last-Modified, so a request can be answered with a 304
+  without reading or serializing any row
+- a missing stamp is recreated as "now", which can only turn a 304 into a 200, never serve stale data
+- story and review stamps are only created for stories that exist, ids that don't are not given a key
+"""
+
+import time
+from django.core.cache import cache
+from django.db import transaction
+from django.http import Http404
+from .models import Story
+from .serializers import StorySerializer
+
+
+STAMP_TTL = 60 * 60 * 24
+
+
+def story_stamp_key(story_id):
+    return f"story:stamp:{story_id}"
+
+
+def reviews_stamp_key(story_id):
+    return f"reviews:stamp:{story_id}"
+
+
+def get_stamp(key):
+    stamp = cache.get(key)
+
+    if stamp is None:
+        cache.add(key, time.time_ns(), STAMP_TTL)
+        stamp = cache.get(key)
+
+    return stamp
+
+
+def get_story_stamp(key, story_id):
+    """
+    get_stamp() for a story or its reviews. A missing stamp is only created once the story is known to exist,
+    a request for an id that doesn't exist raises Http404 and leaves no key behind.
+    """
+    stamp = cache.get(key)
+    if stamp is not None:
+        return stamp
+
+    try:
+        story_id = int(story_id)
+    except (TypeError, ValueError):
+        raise Http404
+
+    # a miss caches the story on the way, so the read that follows the stamp doesn't query again
+    if cache.get(story_cache_key(story_id)) is None and not get_cached_stories([story_id]):
+        raise Http404
+
+    return get_stamp(key)
+
+
+def touch_stamp(key):
+    stamp = time.time_ns()
+    cache.set(key, stamp, STAMP_TTL)
+    return stamp
+
+
+"""
+Per-story cache for the detail endpoint.
+
+- a story is cached as its serialized representation on the first retrieve
+- writes that change the row (update, reactions, ratings) re-read it and overwrite the entry once the transaction commits,
+  so the counters served from the cache stay correct, then move the story's stamp
+- counter writes also bump the story's list tags, cached pages show (and may be ordered by) the same counters
+"""
+
+STORY_CACHE_TTL = 60 * 60
+
+
+def story_cache_key(story_id):
+    return f"story:{story_id}"
+
+
+def cache_story(story, replace=True):
+    """
+    Writers replace the entry, readers filling a miss only add it so they never overwrite a fresher copy
+    stored by a write that committed while they were reading the row.
+    """
+    data = StorySerializer(story).data
+
+    if replace:
+        cache.set(story_cache_key(story.id), data, STORY_CACHE_TTL)
+    else:
+        cache.add(story_cache_key(story.id), data, STORY_CACHE_TTL)
+
+    return data
+
+
+def get_cached_stories(story_ids):
+    """
+    Serialized stories by id: one MGET for the whole batch, one id__in query for the misses.
+    """
+    keys = {story_cache_key(story_id): story_id for story_id in story_ids}
+    found = {keys[key]: data for key, data in cache.get_many(list(keys)).items()}
+
+    missing = [story_id for story_id in story_ids if story_id not in found]
+    if missing:
+        for story in Story.objects.select_related("author").filter(id__in=missing):
+            found[story.id] = cache_story(story, replace=False)
+
+    return found
+
+
+def refresh_stories(story_ids):
+    story_ids = list(story_ids)
+    stories = list(Story.objects.select_related("author").filter(id__in=story_ids))
+
+    entries = {story_cache_key(story.id): StorySerializer(story).data for story in stories}
+    cache.set_many(entries, STORY_CACHE_TTL)
+
+    deleted = [story_cache_key(story_id) for story_id in story_ids if story_cache_key(story_id) not in entries]
+    cache.delete_many(deleted)
+
+    # the stamps move after the entries so a reader can never pair a new ETag with an old body
+    now = time.time_ns()
+    cache.set_many({story_stamp_key(story_id): now for story_id in story_ids}, STAMP_TTL)
+
+    bump_tags([tag for story in stories for tag in tags_for_story(story)])
+
+
+def refresh_story(story_id):
+    refresh_stories([story_id])
+
+
+def refresh_story_on_commit(story_id):
+    transaction.on_commit(lambda: refresh_story(story_id), robust=True)
+
+
+"""
+Generation based invalidation for cached story lists.
+
+- every cached list page is tagged (global list, genre, author pen name)
+- each tag has a generation number stored in the cache, and the generations of a page's tags are part of its cache key
+- a write bumps the generation of the tags it affects, so every page carrying one of them is never read again and simply expires
+- renaming an author bumps both pen name tags and refreshes the author's cached stories (stories/signals.py)
+"""
+
+LIST_CACHE_TTL = 60 * 60 * 6
+
+# pages are cached as rendered bytes per format, the browsable API renders per user and is never cached
+LIST_CACHE_FORMATS = ("json", "msgpack")
+TAG_PREFIX = "stories:tag"
+
+TAG_ALL = "all"
+
+RENAME_BATCH_SIZE = 500
+
+
+def genre_tag(genre):
+    return f"genre:{genre.lower()}"
+
+
+def author_tag(pen_name):
+    return f"author:{pen_name.lower()}"
+
+
+def _tag_key(tag):
+    return f"{TAG_PREFIX}:{tag}"
+
+
+def _new_generation():
+    # seeded from the clock so a tag evicted from the cache never restarts at a generation an old page was stored under
+    return time.time_ns()
+
+
+def tags_for_query(query_params):
+    """
+    A page filtered by genre or author only changes when a story of that genre or author changes,
+    every other page (plain listing, search, ordering) depends on the whole table.
+    """
+    tags = []
+
+    genre = query_params.get("genre")
+    if genre:
+        tags.append(genre_tag(genre))
+
+    author = query_params.get("author")
+    if author:
+        tags.append(author_tag(author))
+
+    return tags or [TAG_ALL]
+
+
+def tags_for_story(story):
+    tags = [TAG_ALL, genre_tag(story.genre)]
+
+    if story.author_id is not None:
+        tags.append(author_tag(story.author.pen_name))
+
+    return tags
+
+
+def get_generations(tags):
+    keys = [_tag_key(tag) for tag in tags]
+    found = cache.get_many(keys)
+
+    generations = []
+    for key in keys:
+        generation = found.get(key)
+
+        if generation is None:
+            cache.add(key, _new_generation(), None)
+            generation = cache.get(key)
+
+        generations.append(str(generation))
+
+    return generations
+
+
+def bump_tags(tags):
+    for tag in set(tags):
+        key = _tag_key(tag)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _new_generation(), None)
+
+
+def refresh_renamed_author(author_id, old_pen_name, new_pen_name, batch_size=RENAME_BATCH_SIZE):
+    """
+    Every cached copy of the author's stories shows the pen name, and the author's list pages are tagged with it.
+    """
+    story_ids = list(Story.objects.filter(author_id=author_id).values_list("id", flat=True))
+
+    for start in range(0, len(story_ids), batch_size):
+        refresh_stories(story_ids[start:start + batch_size])
+
+    bump_tags([TAG_ALL, author_tag(old_pen_name), author_tag(new_pen_name)])
+
+
+def list_cache_key(query_params):
+    generations = get_generations(tags_for_query(query_params))
+    return f"stories:list:{'.'.join(generations)}:{query_params.urlencode()}"
+
+
+def list_body_key(cache_key, renderer_format):
+    return f"{cache_key}:{renderer_format}"
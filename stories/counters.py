@@ -0,0 +1,262 @@
+"""
+Like/dislike counters.
+
+- direct mode (default): every reaction applies its delta to the Story row in one UPDATE
+- write-behind mode (STORY_COUNTERS_WRITE_BEHIND): deltas are accumulated per story in a Redis hash and
+  flush_counters() (celery beat) applies them to the database in one batched UPDATE, so reactions on a viral story
+  no longer queue on its row lock. Reads of a single story add the pending delta to the stored counters.
+  If Redis can't take a delta once the reaction has committed, it is applied directly instead of being lost
+
+Rating aggregates.
+
+- Story keeps the number of ratings, their sum and a count per star, every rating write applies its delta
+  in one UPDATE, with average_rating and bayesian_rating recomputed from the new sum and count in the same statement
+
+Author counters.
+
+- Author keeps totals over its stories (stories, likes, dislikes, reviews, ratings and their sum) for the stats
+  endpoints, every write path that changes a story total applies the same delta to its author
+- reconcile_author_counters() (celery beat) recomputes them from the stories and reviews, fixing any drift
+"""
+
+import logging
+from collections import defaultdict
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce, Greatest, NullIf, Round
+from django_redis import get_redis_connection
+from accounts.models import Author
+from .cache import refresh_story_on_commit, refresh_stories, story_stamp_key, touch_stamp
+from .models import Story, Review, RATING_PRIOR_MEAN, RATING_PRIOR_WEIGHT
+
+
+COUNTER_FIELDS = ("likes", "dislikes")
+REACTION_COUNTERS = {"like": "likes", "dislike": "dislikes"}
+DIRTY_KEY = "story:counters:dirty"
+FLUSH_BATCH_SIZE = 500
+RECONCILE_BATCH_SIZE = 500
+
+logger = logging.getLogger(__name__)
+
+# Story counter -> Author counter
+AUTHOR_COUNTERS = {"likes": "total_likes", "dislikes": "total_dislikes"}
+
+
+def _counters_key(story_id):
+    return f"story:counters:{story_id}"
+
+
+def write_behind_enabled():
+    return settings.STORY_COUNTERS_WRITE_BEHIND
+
+
+def update_reaction_counters(story_id, added=None, removed=None):
+    deltas = dict.fromkeys(COUNTER_FIELDS, 0)
+    if added:
+        deltas[REACTION_COUNTERS[added]] += 1
+    if removed:
+        deltas[REACTION_COUNTERS[removed]] -= 1
+
+    likes, dislikes = deltas["likes"], deltas["dislikes"]
+
+    if write_behind_enabled():
+        transaction.on_commit(lambda: _buffer_deltas(story_id, likes, dislikes), robust=True)
+        return
+
+    _apply_deltas(story_id, likes, dislikes)
+
+
+def _apply_deltas(story_id, likes, dislikes):
+    Story.objects.filter(id=story_id).update(
+        likes=Greatest(F("likes") + likes, 0),
+        dislikes=Greatest(F("dislikes") + dislikes, 0),
+    )
+    update_author_counters(authors_of(story_id), total_likes=likes, total_dislikes=dislikes)
+    refresh_story_on_commit(story_id)
+
+
+def _buffer_deltas(story_id, likes, dislikes):
+    try:
+        redis = get_redis_connection("default")
+
+        pipe = redis.pipeline()
+        if likes:
+            pipe.hincrby(_counters_key(story_id), "likes", likes)
+        if dislikes:
+            pipe.hincrby(_counters_key(story_id), "dislikes", dislikes)
+        pipe.sadd(DIRTY_KEY, story_id)
+        pipe.execute()
+    except Exception:
+        logger.warning("Counter buffering failed, applying the deltas directly", exc_info=True)
+        with transaction.atomic():
+            _apply_deltas(story_id, likes, dislikes)
+        return
+
+    # the counters in the response change, so conditional GETs must not answer 304
+    touch_stamp(story_stamp_key(story_id))
+
+
+def pending_deltas(story_ids):
+    if not write_behind_enabled() or not story_ids:
+        return {}
+
+    redis = get_redis_connection("default")
+
+    pipe = redis.pipeline(transaction=False)
+    for story_id in story_ids:
+        pipe.hmget(_counters_key(story_id), *COUNTER_FIELDS)
+
+    deltas = {}
+    for story_id, values in zip(story_ids, pipe.execute()):
+        if any(values):
+            deltas[story_id] = {field: int(value or 0) for field, value in zip(COUNTER_FIELDS, values)}
+
+    return deltas
+
+
+def merge_pending(items):
+    """
+    Adds the buffered deltas to serialized stories (dicts with id, likes and dislikes), in place.
+    Counters left out of a sparse fieldset are skipped.
+    """
+    deltas = pending_deltas([item["id"] for item in items])
+
+    for item in items:
+        delta = deltas.get(item["id"])
+        if delta:
+            for field in COUNTER_FIELDS:
+                if field in item:
+                    item[field] = max(item[field] + delta[field], 0)
+
+    return items
+
+
+def flush_counters(batch_size=FLUSH_BATCH_SIZE):
+    redis = get_redis_connection("default")
+
+    story_ids = redis.spop(DIRTY_KEY, batch_size)
+    if not story_ids:
+        return 0
+
+    # take the deltas and clear them in one MULTI so no increment is counted twice or lost
+    pipe = redis.pipeline(transaction=True)
+    for story_id in story_ids:
+        pipe.hgetall(_counters_key(int(story_id)))
+        pipe.delete(_counters_key(int(story_id)))
+    results = pipe.execute()[::2]
+
+    deltas = {}
+    for story_id, values in zip(story_ids, results):
+        if values:
+            deltas[int(story_id)] = {field.decode(): int(value) for field, value in values.items()}
+
+    if not deltas:
+        return 0
+
+    try:
+        with transaction.atomic():
+            Story.objects.filter(id__in=deltas).update(**{
+                field: Greatest(F(field) + _delta_case(deltas, field), 0) for field in COUNTER_FIELDS
+            })
+            _flush_author_counters(deltas)
+    except Exception:
+        for story_id, delta in deltas.items():
+            _buffer_deltas(story_id, delta.get("likes", 0), delta.get("dislikes", 0))
+        raise
+
+    refresh_stories(deltas)
+    return len(deltas)
+
+
+def _flush_author_counters(deltas):
+    author_deltas = defaultdict(lambda: dict.fromkeys(COUNTER_FIELDS, 0))
+
+    stories = Story.objects.filter(id__in=deltas, author__isnull=False).values_list("id", "author_id")
+    for story_id, author_id in stories:
+        for field in COUNTER_FIELDS:
+            author_deltas[author_id][field] += deltas[story_id].get(field, 0)
+
+    if author_deltas:
+        Author.objects.filter(pk__in=author_deltas).update(**{
+            AUTHOR_COUNTERS[field]: Greatest(F(AUTHOR_COUNTERS[field]) + _delta_case(author_deltas, field, "pk"), 0)
+            for field in COUNTER_FIELDS
+        })
+
+
+def _delta_case(deltas, field, key="id"):
+    return Case(
+        *[When(**{key: pk}, then=Value(delta.get(field, 0))) for pk, delta in deltas.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def update_rating_aggregates(story_id, added=None, removed=None):
+    count = sum_ = 0
+    fields = {}
+
+    if added:
+        count, sum_ = count + 1, sum_ + added
+        fields[f"ratings_{added}"] = F(f"ratings_{added}") + 1
+    if removed:
+        count, sum_ = count - 1, sum_ - removed
+        fields[f"ratings_{removed}"] = Greatest(F(f"ratings_{removed}") - 1, 0)
+
+    # a drifted row never goes below zero, the columns are unsigned
+    new_count = Greatest(F("total_ratings") + count, 0)
+    new_sum = Greatest(F("rating_sum") + sum_, 0)
+
+    Story.objects.filter(id=story_id).update(
+        total_ratings=new_count,
+        rating_sum=new_sum,
+        # float division (Round casts it back to numeric on PostgreSQL), NULLIF turns removing the last rating into 0
+        average_rating=Coalesce(Round(Cast(new_sum, FloatField()) / NullIf(new_count, 0), 2), 0.0),
+        bayesian_rating=(Value(RATING_PRIOR_WEIGHT * RATING_PRIOR_MEAN) + Cast(new_sum, FloatField()))
+        / (Value(float(RATING_PRIOR_WEIGHT)) + new_count),
+        **fields,
+    )
+    update_author_counters(authors_of(story_id), total_ratings=count, rating_sum=sum_)
+    refresh_story_on_commit(story_id)
+
+
+def authors_of(story_id):
+    return Author.objects.filter(stories__id=story_id)
+
+
+def update_author_counters(authors, **deltas):
+    """
+    Applies counter deltas (total_likes=1, rating_sum=-4, ...) to the given authors in one UPDATE.
+    """
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if deltas:
+        authors.update(**{field: Greatest(F(field) + delta, 0) for field, delta in deltas.items()})
+
+
+def author_counter_expressions():
+    """
+    The author counters computed from their source rows.
+    """
+    stories = Story.objects.filter(author=OuterRef("pk")).order_by().values("author")
+    reviews = Review.objects.filter(story__author=OuterRef("pk")).order_by().values("story__author")
+
+    def total(queryset, aggregate):
+        return Coalesce(Subquery(queryset.annotate(total=aggregate).values("total")), 0)
+
+    return {
+        "total_stories": total(stories, Count("id")),
+        "total_likes": total(stories, Sum("likes")),
+        "total_dislikes": total(stories, Sum("dislikes")),
+        "total_ratings": total(stories, Sum("total_ratings")),
+        "rating_sum": total(stories, Sum("rating_sum")),
+        "total_reviews": total(reviews, Count("id")),
+    }
+
+
+def reconcile_author_counters(batch_size=RECONCILE_BATCH_SIZE):
+    author_ids = list(Author.objects.order_by("pk").values_list("pk", flat=True))
+
+    for start in range(0, len(author_ids), batch_size):
+        Author.objects.filter(pk__in=author_ids[start:start + batch_size]).update(**author_counter_expressions())
+
+    return len(author_ids)
@@ -1,5 +1,7 @@
 from django_filters import rest_framework as filters
+from rest_framework.filters import SearchFilter, OrderingFilter
 from .models import Story
+from .search import get_search_backend
 
 class StoryFilter(filters.FilterSet):
     author = filters.CharFilter(field_name="author__pen_name", lookup_expr="iexact")
@@ -8,3 +10,32 @@ class StoryFilter(filters.FilterSet):
     class Meta:
         model = Story
         fields = ["author", "genre"]
+
+
+class StorySearchFilter(SearchFilter):
+    """
+    ?search= through the full-text backend of the current database instead of icontains on every column.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+
+        if not terms:
+            return queryset
+
+        return get_search_backend().search(queryset, terms)
+
+
+class StoryOrderingFilter(OrderingFilter):
+    """
+    Search results are ordered by relevance unless the client picked an ordering.
+    """
+
+    def get_ordering(self, request, queryset, view):
+        query = queryset.query
+        ranked = "search_rank" in query.annotations or "search_rank" in query.extra
+
+        if ranked and not request.query_params.get(self.ordering_param):
+            return ["-search_rank", "-id"]
+
+        return super().get_ordering(request, queryset, view)
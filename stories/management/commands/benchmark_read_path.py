@@ -0,0 +1,97 @@
+"""
+Compares the ModelSerializer list path with the ValuesPlan path used by the story and review lists.
+
+- seeds stories and reviews inside a transaction that is rolled back, the database is left untouched
+- renders both paths to JSON and fails if the bytes differ
+- reports the best time of each path per page
+
+    python manage.py benchmark_read_path --rows 20 --number 200
+"""
+
+import timeit
+import uuid
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from accounts.models import Author, User
+from core.serializers import ValuesPlan
+from stories.models import Story, Review
+from stories.serializers import StorySerializer, StorySummarySerializer, ReviewSerializer
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Benchmark the values() read path against the serializers and check the output is byte-identical."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=20, help="rows per page (the list page size)")
+        parser.add_argument("--number", type=int, default=200, help="pages rendered per timing run")
+        parser.add_argument("--repeat", type=int, default=5, help="timing runs, the best one is reported")
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, options):
+        rows = options["rows"]
+        story = self.seed(rows)
+
+        stories = Story.objects.select_related("author").order_by("-created_at")[:rows]
+        reviews = Review.objects.filter(story=story).select_related("story").order_by("-created_at")[:rows]
+
+        cases = [
+            ("stories", StorySerializer, stories),
+            ("stories ?mode=summary", StorySummarySerializer, stories),
+            ("reviews", ReviewSerializer, reviews),
+        ]
+
+        renderer = JSONRenderer()
+        self.stdout.write(f"{'list':<24}{'serializer':>14}{'values plan':>14}{'speedup':>10}")
+
+        for name, serializer_class, queryset in cases:
+            def serializer_path():
+                return renderer.render(serializer_class(list(queryset.all()), many=True).data)
+
+            def values_path():
+                plan = ValuesPlan(serializer_class())
+                return renderer.render(plan.to_representation(list(plan.values(queryset.all()))))
+
+            if serializer_path() != values_path():
+                raise CommandError(f"{name}: the values plan output differs from the serializer output")
+
+            slow = self.best(serializer_path, options)
+            fast = self.best(values_path, options)
+            self.stdout.write(f"{name:<24}{slow * 1000:>12.3f}ms{fast * 1000:>12.3f}ms{slow / fast:>9.1f}x")
+
+        self.stdout.write(self.style.SUCCESS("output is byte-identical"))
+
+    def best(self, func, options):
+        return min(timeit.repeat(func, number=options["number"], repeat=options["repeat"])) / options["number"]
+
+    def seed(self, rows):
+        suffix = uuid.uuid4().hex[:8]
+        user = User.objects.create_user(username=f"bench_{suffix}", email=f"bench_{suffix}@example.com")
+        author = Author.objects.create(user=user, pen_name=f"bench_{suffix}")
+
+        content = "The package arrived on a quiet Tuesday morning. " * 40
+        stories = [
+            Story.objects.create(author=author, title=f"Benchmark story {i}", content=content, genre="mystery")
+            for i in range(rows)
+        ]
+
+        users = User.objects.bulk_create(
+            User(username=f"bench_{suffix}_{i}", email=f"bench_{suffix}_{i}@example.com") for i in range(rows)
+        )
+        Review.objects.bulk_create(
+            Review(story=stories[0], user=reviewer, alias=reviewer.username, content="A thoughtful review. " * 10)
+            for reviewer in users
+        )
+
+        return stories[0]
@@ -0,0 +1,19 @@
+# Generated by Django 6.0 on 2026-10-17 22:29
+
+from django.db import migrations, models
+from core.operations import AddIndexConcurrentlyIfPostgres
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('stories', '0010_alter_story_title'),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyIfPostgres(
+            model_name='review',
+            index=models.Index(fields=['story', 'created_at', 'id'], name='review_story_created_idx'),
+        ),
+    ]
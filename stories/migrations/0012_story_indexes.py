@@ -0,0 +1,37 @@
+# Generated by Django 6.0 on 2026-10-17 22:30
+
+import django.db.models.functions.text
+from django.db import migrations, models
+from core.operations import AddIndexConcurrentlyIfPostgres
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('accounts', '0005_author_author_pen_name_upper_idx'),
+        ('stories', '0011_review_story_created_idx'),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyIfPostgres(
+            model_name='story',
+            index=models.Index(fields=['created_at', 'id'], name='story_created_idx'),
+        ),
+        AddIndexConcurrentlyIfPostgres(
+            model_name='story',
+            index=models.Index(fields=['likes', 'id'], name='story_likes_idx'),
+        ),
+        AddIndexConcurrentlyIfPostgres(
+            model_name='story',
+            index=models.Index(fields=['dislikes', 'id'], name='story_dislikes_idx'),
+        ),
+        AddIndexConcurrentlyIfPostgres(
+            model_name='story',
+            index=models.Index(fields=['author', 'created_at', 'id'], name='story_author_created_idx'),
+        ),
+        AddIndexConcurrentlyIfPostgres(
+            model_name='story',
+            index=models.Index(django.db.models.functions.text.Upper('genre'), models.F('created_at'), models.F('id'), name='story_genre_upper_created_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 6.0 on 2026-10-17 22:32
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+from core.operations import AddIndexConcurrentlyOnlyPostgres
+
+
+FTS_TABLE = "stories_story_fts"
+
+
+def create_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+
+    schema_editor.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(title, content)")
+    schema_editor.execute(
+        f"INSERT INTO {FTS_TABLE} (rowid, title, content) SELECT id, title, content FROM stories_story"
+    )
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+
+    schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('stories', '0012_story_indexes'),
+    ]
+
+    operations = [
+        # database only: SQLite rebuilds every index of the model state whenever it remakes the table,
+        # and it can't build a GIN index
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                AddIndexConcurrentlyOnlyPostgres(
+                    model_name='story',
+                    index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.SearchVector('title', config='english', weight='A'), '||', django.contrib.postgres.search.SearchVector('content', config='english', weight='B'), django.contrib.postgres.search.SearchConfig('english')), name='story_search_gin_idx'),
+                ),
+            ],
+        ),
+        migrations.RunPython(create_fts_table, drop_fts_table),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 6.0 on 2026-10-17 22:35
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    Story = apps.get_model("stories", "Story")
+    Rating = apps.get_model("stories", "Rating")
+
+    aggregates = {}
+    for row in Rating.objects.values("story_id", "rating").annotate(count=Count("id")):
+        story = aggregates.setdefault(row["story_id"], {"rating_sum": 0})
+        story["rating_sum"] += row["rating"] * row["count"]
+        story[f"ratings_{row['rating']}"] = row["count"]
+
+    for story_id, fields in aggregates.items():
+        Story.objects.filter(id=story_id).update(**fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stories', '0013_story_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='story',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='story',
+            name='ratings_1',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='story',
+            name='ratings_2',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='story',
+            name='ratings_3',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='story',
+            name='ratings_4',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='story',
+            name='ratings_5',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:38
+
+from django.db import migrations, models
+
+
+# copies of stories.models.make_excerpt / reading_time_minutes as they were when this migration was written
+EXCERPT_LENGTH = 200
+WORDS_PER_MINUTE = 200
+BATCH_SIZE = 500
+
+
+def make_excerpt(content, length=EXCERPT_LENGTH):
+    text = " ".join(content.split())
+    if len(text) <= length:
+        return text
+
+    cut = text[:length].rsplit(" ", 1)[0] or text[:length]
+    return cut.rstrip(",.;:!?-") + "…"
+
+
+def reading_time_minutes(content):
+    return max(1, -(-len(content.split()) // WORDS_PER_MINUTE))
+
+
+def backfill_excerpts(apps, schema_editor):
+    Story = apps.get_model("stories", "Story")
+
+    stories = []
+    for story in Story.objects.only("id", "content").iterator(chunk_size=BATCH_SIZE):
+        story.excerpt = make_excerpt(story.content)
+        story.reading_time = reading_time_minutes(story.content)
+        stories.append(story)
+
+        if len(stories) == BATCH_SIZE:
+            Story.objects.bulk_update(stories, ["excerpt", "reading_time"])
+            stories = []
+
+    Story.objects.bulk_update(stories, ["excerpt", "reading_time"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stories', '0014_story_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='story',
+            name='excerpt',
+            field=models.CharField(blank=True, default='', max_length=201),
+        ),
+        migrations.AddField(
+            model_name='story',
+            name='reading_time',
+            field=models.PositiveSmallIntegerField(default=1),
+        ),
+        migrations.RunPython(backfill_excerpts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:52
+
+from django.db import migrations, models
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Cast
+from core.operations import AddIndexConcurrentlyIfPostgres
+
+
+# copies of stories.models.RATING_PRIOR_MEAN / RATING_PRIOR_WEIGHT as they were when this migration was written
+RATING_PRIOR_MEAN = 3.0
+RATING_PRIOR_WEIGHT = 10
+
+
+def backfill_bayesian_rating(apps, schema_editor):
+    Story = apps.get_model("stories", "Story")
+
+    Story.objects.filter(total_ratings__gt=0).update(
+        bayesian_rating=(Value(RATING_PRIOR_WEIGHT * RATING_PRIOR_MEAN) + Cast(F("rating_sum"), FloatField()))
+        / (Value(float(RATING_PRIOR_WEIGHT)) + F("total_ratings"))
+    )
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('accounts', '0005_author_author_pen_name_upper_idx'),
+        ('stories', '0015_story_excerpt'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='story',
+            name='bayesian_rating',
+            field=models.FloatField(default=3.0),
+        ),
+        migrations.RunPython(backfill_bayesian_rating, migrations.RunPython.noop, atomic=True),
+        AddIndexConcurrentlyIfPostgres(
+            model_name='story',
+            index=models.Index(fields=['bayesian_rating', 'id'], name='story_bayesian_idx'),
+        ),
+        AddIndexConcurrentlyIfPostgres(
+            model_name='story',
+            index=models.Index(fields=['genre', 'bayesian_rating', 'id'], name='story_genre_bayesian_idx'),
+        ),
+    ]
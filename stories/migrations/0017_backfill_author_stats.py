@@ -0,0 +1,37 @@
+from django.db import migrations
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def total(queryset, aggregate):
+    return Coalesce(Subquery(queryset.annotate(total=aggregate).values("total")), 0)
+
+
+def backfill_author_stats(apps, schema_editor):
+    Author = apps.get_model("accounts", "Author")
+    Story = apps.get_model("stories", "Story")
+    Review = apps.get_model("stories", "Review")
+
+    stories = Story.objects.filter(author=OuterRef("pk")).order_by().values("author")
+    reviews = Review.objects.filter(story__author=OuterRef("pk")).order_by().values("story__author")
+
+    Author.objects.update(
+        total_stories=total(stories, Count("id")),
+        total_likes=total(stories, Sum("likes")),
+        total_dislikes=total(stories, Sum("dislikes")),
+        total_ratings=total(stories, Sum("total_ratings")),
+        rating_sum=total(stories, Sum("rating_sum")),
+        total_reviews=total(reviews, Count("id")),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_author_stats'),
+        ('stories', '0016_story_bayesian_rating'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_author_stats, migrations.RunPython.noop),
+    ]
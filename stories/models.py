@@ -1,6 +1,34 @@
 from django.db import models
+from django.db.models import F
+from django.db.models.functions import Upper
 from accounts.models import Author, User
 
+
+RATING_STAR_FIELDS = ("ratings_1", "ratings_2", "ratings_3", "ratings_4", "ratings_5")
+
+# bayesian_rating = (PRIOR_WEIGHT * PRIOR_MEAN + rating_sum) / (PRIOR_WEIGHT + total_ratings), i.e. every story
+# starts with PRIOR_WEIGHT virtual ratings of PRIOR_MEAN, so a handful of ratings can't outrank hundreds
+RATING_PRIOR_MEAN = 3.0
+RATING_PRIOR_WEIGHT = 10
+
+EXCERPT_LENGTH = 200
+WORDS_PER_MINUTE = 200
+
+
+def make_excerpt(content, length=EXCERPT_LENGTH):
+    text = " ".join(content.split())
+    if len(text) <= length:
+        return text
+
+    # cut on the last word boundary so the excerpt doesn't end mid-word
+    cut = text[:length].rsplit(" ", 1)[0] or text[:length]
+    return cut.rstrip(",.;:!?-") + "…"
+
+
+def reading_time_minutes(content):
+    return max(1, -(-len(content.split()) // WORDS_PER_MINUTE))
+
+
 class Story(models.Model):
     author = models.ForeignKey(Author, on_delete=models.SET_NULL, null=True, related_name='stories')
     title = models.CharField(max_length=250)
@@ -18,9 +46,50 @@ class Story(models.Model):
     average_rating = models.DecimalField(max_digits=3, decimal_places=2, default=0)
     total_ratings = models.PositiveIntegerField(default=0)
 
+    # running rating aggregates, average_rating = rating_sum / total_ratings
+    rating_sum = models.PositiveIntegerField(default=0)
+    ratings_1 = models.PositiveIntegerField(default=0)
+    ratings_2 = models.PositiveIntegerField(default=0)
+    ratings_3 = models.PositiveIntegerField(default=0)
+    ratings_4 = models.PositiveIntegerField(default=0)
+    ratings_5 = models.PositiveIntegerField(default=0)
+    bayesian_rating = models.FloatField(default=RATING_PRIOR_MEAN)
+
+    # derived from content on save, so list cards never need to load the full text
+    excerpt = models.CharField(max_length=EXCERPT_LENGTH + 1, blank=True, default="")
+    reading_time = models.PositiveSmallIntegerField(default=1)
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+
+        if update_fields is None or "content" in update_fields:
+            self.excerpt = make_excerpt(self.content)
+            self.reading_time = reading_time_minutes(self.content)
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "excerpt", "reading_time"}
+
+        super().save(*args, **kwargs)
+
+    @property
+    def rating_distribution(self):
+        return {field.rsplit("_", 1)[1]: getattr(self, field) for field in RATING_STAR_FIELDS}
+
     class Meta:
         ordering = ["-created_at"]
 
+        # list orderings and filters, id is the keyset tie-breaker
+        # genre is filtered with iexact, which PostgreSQL compiles to UPPER(genre) = UPPER(%s)
+        # the full-text search index is PostgreSQL only and lives in migration 0013, see stories/search.py
+        indexes = [
+            models.Index(fields=["created_at", "id"], name="story_created_idx"),
+            models.Index(fields=["likes", "id"], name="story_likes_idx"),
+            models.Index(fields=["dislikes", "id"], name="story_dislikes_idx"),
+            models.Index(fields=["author", "created_at", "id"], name="story_author_created_idx"),
+            models.Index(Upper("genre"), F("created_at"), F("id"), name="story_genre_upper_created_idx"),
+            models.Index(fields=["bayesian_rating", "id"], name="story_bayesian_idx"),
+            models.Index(fields=["genre", "bayesian_rating", "id"], name="story_genre_bayesian_idx"),
+        ]
+
 class Reaction(models.Model):
     REACTION_CHOICES = (
         ('like', 'Like'), 
@@ -65,6 +134,10 @@ class Review(models.Model):
         
         ]
 
+        indexes = [
+            models.Index(fields=["story", "created_at", "id"], name="review_story_created_idx"),
+        ]
+
         ordering = ["-created_at"]
 
 
@@ -1,5 +1,136 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import namedtuple
+from types import SimpleNamespace
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.utils.urls import replace_query_param
 
 
-class ReviewsPagination(PageNumberPagination):
-    page_size = 10
\ No newline at end of file
+KeysetCursor = namedtuple("KeysetCursor", ["reverse", "position"])
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Keyset pagination on (ordering field, id).
+
+    - the cursor carries the ordering value and id of the row at the edge of the page, the next page is fetched with
+      `WHERE (field, id) < (value, id)` instead of an OFFSET, so every page costs the same whatever its depth
+    - id breaks ties, so non unique fields (likes, dislikes) paginate without skipping or repeating rows
+    - no COUNT(*) is run, the response only has next/previous links
+    """
+    ordering = "-created_at"
+    ordering_fields = ()
+    tie_breaker = "id"
+
+    def get_keyset_ordering(self, request):
+        ordering = request.query_params.get("ordering", "").split(",")[0].strip()
+
+        if ordering.lstrip("-") in self.ordering_fields:
+            return ordering
+
+        return self.ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.keyset_ordering = self.get_keyset_ordering(request)
+        self.field = self.keyset_ordering.lstrip("-")
+        self.model_field = queryset.model._meta.get_field(self.field)
+
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor.reverse if self.cursor else False
+
+        # a previous-page cursor scans backwards from the first row of the page it came from
+        descending = self.keyset_ordering.startswith("-") != reverse
+        queryset = queryset.order_by(*self._order_by(descending))
+
+        if self.cursor:
+            queryset = queryset.filter(self._after(self.cursor.position, descending))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor is not None
+
+        return self.page
+
+    def _order_by(self, descending):
+        prefix = "-" if descending else ""
+        return [f"{prefix}{self.field}", f"{prefix}{self.tie_breaker}"]
+
+    def _after(self, position, descending):
+        value, pk = position
+        lookup = "lt" if descending else "gt"
+
+        return Q(**{f"{self.field}__{lookup}": value}) | Q(
+            **{self.field: value, f"{self.tie_breaker}__{lookup}": pk}
+        )
+
+    def _position(self, instance):
+        # pages of values() rows are dicts
+        if isinstance(instance, dict):
+            instance = SimpleNamespace(**instance)
+        return [self.model_field.value_to_string(instance), getattr(instance, self.tie_breaker)]
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def encode_cursor(self, instance, reverse):
+        payload = {"o": self.keyset_ordering, "r": int(reverse), "p": self._position(instance)}
+        encoded = urlsafe_b64encode(json.dumps(payload).encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            payload = json.loads(urlsafe_b64decode(encoded.encode()))
+            value, pk = payload["p"]
+
+            # a cursor only makes sense for the ordering it was issued for
+            if payload["o"] != self.keyset_ordering:
+                raise ValueError
+
+            position = (self.model_field.to_python(value), int(pk))
+            reverse = bool(payload["r"])
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+        return KeysetCursor(reverse=reverse, position=position)
+
+
+class StoryCursorPagination(KeysetPagination):
+    ordering_fields = ("created_at", "likes", "dislikes", "bayesian_rating")
+
+
+class TopRatedPagination(KeysetPagination):
+    ordering = "-bayesian_rating"
+    page_size = 20
+
+
+class ReviewsPagination(KeysetPagination):
+    ordering = "-created_at"
+    page_size = 10
+    page_size_query_param = "page_size"
+    max_page_size = 50
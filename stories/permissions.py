@@ -1,45 +1,41 @@
 from rest_framework.permissions import BasePermission
+from accounts.identity import identity, is_story_author, is_moderator
 
 
 
 class IsAuthor(BasePermission):
     def has_permission(self, request, view):
-        return request.user.is_authenticated and hasattr(request.user, "author")
+        return identity(request).author_id is not None
     
 
 class IsStoryOwner(BasePermission):
     def has_object_permission(self, request, view, obj):
-        return request.user.is_authenticated and hasattr(request.user, "author") and obj.author.user == request.user
+        return is_story_author(request, obj)
     
 
 class CanDeleteStory(BasePermission):
     def has_object_permission(self, request, view, obj):
-        if not request.user.is_authenticated:
+        if identity(request).user_id is None:
             return False
 
-        if hasattr(request.user, "author") and obj.author.user == request.user:
+        if is_story_author(request, obj):
             return True
 
-        if getattr(request.user, "role", None) in ("superuser", "admin", "moderator"):
+        if is_moderator(request):
             return True
 
         return False
     
 class IsReviewOwner(BasePermission):
     def has_object_permission(self, request, view, obj):
-        return obj.user == request.user
+        return obj.user_id == identity(request).user_id
 
 class CanDeleteReview(BasePermission):
     def has_object_permission(self, request, view, obj):
-        if obj.user == request.user:
+        if obj.user_id == identity(request).user_id:
             return True
         
-        if getattr(request.user, "role", None) in ("superuser", "admin", "moderator"):
+        if is_moderator(request):
             return True
 
         return False
-
-
-
-
-        
@@ -0,0 +1,96 @@
+"""
+Full-text search over story title and content.
+
+- PostgreSQL: a weighted tsvector (title A, content B) matched with websearch syntax and ranked with ts_rank,
+  served by a GIN index on the same expression (migration 0013), which PostgreSQL keeps up to date by itself
+- SQLite: an FTS5 table (stories_story_fts) ranked with bm25, kept in sync by the Story save/delete signals
+- any other backend falls back to icontains on both columns
+
+Every backend annotates `search_rank` (higher is better) when it can rank, StoryOrderingFilter orders by it
+when the client didn't ask for another ordering.
+"""
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import Q
+
+
+SEARCH_CONFIG = "english"
+SEARCH_INDEX = "story_search_gin_idx"
+FTS_TABLE = "stories_story_fts"
+
+# bm25 weights for the title and content columns
+FTS_WEIGHTS = (10.0, 1.0)
+
+
+def story_search_vector():
+    return SearchVector("title", weight="A", config=SEARCH_CONFIG) + SearchVector(
+        "content", weight="B", config=SEARCH_CONFIG
+    )
+
+
+class PostgresSearchBackend:
+    def search(self, queryset, terms):
+        query = SearchQuery(" ".join(terms), search_type="websearch", config=SEARCH_CONFIG)
+
+        # alias() keeps the vector out of the SELECT, the WHERE clause matches the GIN index expression
+        return queryset.alias(search_document=story_search_vector()).filter(
+            search_document=query
+        ).annotate(search_rank=SearchRank(story_search_vector(), query))
+
+    def index_story(self, story):
+        pass
+
+    def remove_story(self, story_id):
+        pass
+
+
+class SQLiteSearchBackend:
+    def search(self, queryset, terms):
+        table = queryset.model._meta.db_table
+
+        return queryset.extra(
+            tables=[FTS_TABLE],
+            where=[f"{FTS_TABLE}.rowid = {table}.id", f"{FTS_TABLE} MATCH %s"],
+            params=[self.match_expression(terms)],
+            select={"search_rank": f"-bm25({FTS_TABLE}, {FTS_WEIGHTS[0]}, {FTS_WEIGHTS[1]})"},
+        )
+
+    def match_expression(self, terms):
+        # every term is quoted so user input can't inject FTS5 syntax, and prefix matched like the old icontains search
+        return " ".join('"%s"*' % term.replace('"', '""') for term in terms)
+
+    def index_story(self, story):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [story.id])
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, title, content) VALUES (%s, %s, %s)",
+                [story.id, story.title, story.content],
+            )
+
+    def remove_story(self, story_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [story_id])
+
+
+class ContainsSearchBackend:
+    def search(self, queryset, terms):
+        for term in terms:
+            queryset = queryset.filter(Q(title__icontains=term) | Q(content__icontains=term))
+        return queryset
+
+    def index_story(self, story):
+        pass
+
+    def remove_story(self, story_id):
+        pass
+
+
+def get_search_backend():
+    if connection.vendor == "postgresql":
+        return PostgresSearchBackend()
+
+    if connection.vendor == "sqlite":
+        return SQLiteSearchBackend()
+
+    return ContainsSearchBackend()
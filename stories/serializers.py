@@ -1,12 +1,13 @@
 from rest_framework import serializers
+from core.serializers import SparseFieldsetsMixin
 from .models import Story, Reaction, Review, Rating
 
-class StorySerializer(serializers.ModelSerializer):
+class StorySerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     author = serializers.CharField(source="author.pen_name", read_only=True)
     class Meta:
         model = Story
-        fields = ["id", "title", "content", "author", "genre", "likes", "dislikes", "average_rating", "total_ratings", "created_at"]
-        read_only_fields = ["author", "created_at", "likes", "dislikes", "average_rating", "total_ratings"]
+        fields = ["id", "title", "content", "author", "genre", "likes", "dislikes", "average_rating", "total_ratings", "bayesian_rating", "created_at"]
+        read_only_fields = ["author", "created_at", "likes", "dislikes", "average_rating", "total_ratings", "bayesian_rating"]
     
     def validate_title(self, value):
         if len(value.strip()) < 3:
@@ -18,6 +19,23 @@ class StorySerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Content must be at least 10 characters long.")
         return value
 
+    def update(self, instance, validated_data):
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
+        # the counters and rating aggregates move with update() queries (stories/counters.py) while a story is
+        # being edited, only the edited columns are written back
+        instance.save(update_fields=list(validated_data))
+        return instance
+
+
+class StorySummarySerializer(StorySerializer):
+    """
+    List cards: the precomputed excerpt and reading time instead of the full content.
+    """
+    class Meta(StorySerializer.Meta):
+        fields = ["id", "title", "excerpt", "reading_time", "author", "genre", "likes", "dislikes", "average_rating", "total_ratings", "bayesian_rating", "created_at"]
+        read_only_fields = StorySerializer.Meta.read_only_fields + ["excerpt", "reading_time"]
+
 
 class ReactionSerializer(serializers.ModelSerializer):
     class Meta:
@@ -0,0 +1,41 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from accounts.models import Author
+from .cache import refresh_renamed_author
+from .models import Story
+from .search import get_search_backend
+
+
+SEARCH_FIELDS = {"title", "content"}
+
+
+@receiver(post_save, sender=Story)
+def index_story(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not SEARCH_FIELDS.intersection(update_fields):
+        return
+
+    get_search_backend().index_story(instance)
+
+
+@receiver(post_delete, sender=Story)
+def remove_story_from_index(sender, instance, **kwargs):
+    get_search_backend().remove_story(instance.id)
+
+
+@receiver(pre_save, sender=Author)
+def remember_pen_name(sender, instance, update_fields=None, **kwargs):
+    if instance._state.adding or (update_fields is not None and "pen_name" not in update_fields):
+        return
+
+    instance._saved_pen_name = sender.objects.filter(pk=instance.pk).values_list("pen_name", flat=True).first()
+
+
+@receiver(post_save, sender=Author)
+def refresh_author_stories(sender, instance, **kwargs):
+    old_pen_name = instance.__dict__.pop("_saved_pen_name", None)
+    if old_pen_name is None or old_pen_name == instance.pen_name:
+        return
+
+    author_id, new_pen_name = instance.pk, instance.pen_name
+    transaction.on_commit(lambda: refresh_renamed_author(author_id, old_pen_name, new_pen_name), robust=True)
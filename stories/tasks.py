@@ -0,0 +1,18 @@
+from celery import shared_task
+from .counters import flush_counters, reconcile_author_counters
+from .trending import compact
+
+
+@shared_task
+def flush_story_counters():
+    return flush_counters()
+
+
+@shared_task
+def compact_trending_scores():
+    return compact()
+
+
+@shared_task
+def reconcile_author_stats():
+    return reconcile_author_counters()
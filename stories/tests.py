@@ -1,11 +1,28 @@
 from re import search
 from django.core.cache import cache
+from django.db import connection
+from django.http import QueryDict
+from django_redis import get_redis_connection
 from django.utils import timezone
 from datetime import timedelta
-import pytest, time
+import pytest, time, gzip, msgpack
 from django.urls import reverse
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from accounts.models import Author, User
+from core.serializers import ValuesPlan
+from core.stampede import acquire, release, lock_key
 from .models import Story, Review, Reaction, Rating
+from .pagination import ReviewsPagination
+from .permissions import IsAuthor, IsStoryOwner, CanDeleteStory, IsReviewOwner, CanDeleteReview
+from .serializers import StorySerializer, StorySummarySerializer, ReviewSerializer
+from .cache import list_cache_key, list_body_key, story_stamp_key, reviews_stamp_key
+from .counters import flush_counters, reconcile_author_counters, update_rating_aggregates
+from .search import PostgresSearchBackend, SEARCH_INDEX
+from . import counters, trending
+from .trending import trending_ids
 
 
 
@@ -80,6 +97,34 @@ class TestStoryViewset:
         assert titles1 == []
         assert titles2 == ["Jungle"]
 
+    def test_stories_search_ranks_title_matches_first(self, create_story_api, api_client, story_data):
+        create_story_api({**story_data, "title": "Night Market", "content": "A dragon sleeps under the old bridge."})
+        create_story_api({**story_data, "title": "The Dragon Keeper", "content": "Nobody in town believed him."})
+        create_story_api({**story_data, "title": "Unrelated", "content": "Nothing to see in this one."})
+
+        response = api_client.get(reverse("story-list"), {"search": "dragon"})
+        titles = [s["title"] for s in response.data["results"]]
+
+        assert titles == ["The Dragon Keeper", "Night Market"]
+
+    def test_stories_search_index_follows_updates(self, create_story_api, api_client, author, story_data):
+        user, _ = author
+        story_id = create_story_api({**story_data, "title": "Old Lighthouse"}).data["id"]
+
+        api_client.force_authenticate(user=user)
+        api_client.patch(reverse("story-detail", kwargs={"pk": story_id}), {"title": "Silent Harbour"}, format="json")
+
+        old = api_client.get(reverse("story-list"), {"search": "lighthouse"})
+        new = api_client.get(reverse("story-list"), {"search": "harbour"})
+
+        assert old.data["results"] == []
+        assert [s["id"] for s in new.data["results"]] == [story_id]
+
+        api_client.delete(reverse("story-detail", kwargs={"pk": story_id}))
+        response = api_client.get(reverse("story-list"), {"search": "harbour"})
+
+        assert response.data["results"] == []
+
     #TESTING CACHING
     # METHOD A --- Checking no. of database hit before and after(which should be zero) caching
     def test_stories_list_uses_cache(
@@ -117,6 +162,319 @@ class TestStoryViewset:
         print(f"First: {first_time:.4f}s | Cached: {second_time:.4f}s") #confirm time difference
         assert second_time < first_time
 
+    def test_create_story_invalidates_cached_list(self, api_client, create_story_api, story_data):
+        url = reverse("story-list")
+
+        create_story_api({**story_data, "title": "Story A"})
+        api_client.get(url)
+
+        create_story_api({**story_data, "title": "Story B"})
+        response = api_client.get(url)
+
+        titles = [s["title"] for s in response.data["results"]]
+        assert titles == ["Story B", "Story A"]
+
+    def test_update_story_invalidates_cached_list(self, api_client, author, create_story):
+        user, author = author
+        story = create_story(author=author, genre="comedy")
+        url = reverse("story-list")
+
+        api_client.get(url, {"genre": "comedy"})
+
+        api_client.force_authenticate(user=user)
+        api_client.patch(reverse("story-detail", kwargs={"pk": story.pk}), {"genre": "mystery"}, format="json")
+
+        comedy = api_client.get(url, {"genre": "comedy"})
+        mystery = api_client.get(url, {"genre": "mystery"})
+
+        assert comedy.data["results"] == []
+        assert [s["id"] for s in mystery.data["results"]] == [story.id]
+
+    def test_write_keeps_unrelated_genre_page_cached(
+            self,
+            api_client,
+            create_story_api,
+            story_data,
+            django_assert_num_queries,
+    ):
+        url = reverse("story-list")
+
+        create_story_api({**story_data, "genre": "comedy"})
+        api_client.get(url, {"genre": "comedy"})
+
+        create_story_api({**story_data, "genre": "mystery"})
+
+        with django_assert_num_queries(0):
+            api_client.get(url, {"genre": "comedy"})
+
+    def test_author_rename_refreshes_cached_stories(
+            self,
+            api_client,
+            author,
+            create_story,
+            django_capture_on_commit_callbacks,
+    ):
+        _, author_profile = author
+        story = create_story(author=author_profile)
+        url = reverse("story-list")
+
+        api_client.get(url)
+        api_client.get(url, {"author": "Nakamoto"})
+        api_client.get(reverse("story-detail", kwargs={"pk": story.id}))
+
+        with django_capture_on_commit_callbacks(execute=True):
+            author_profile.pen_name = "Nakamoto"
+            author_profile.save(update_fields=["pen_name"])
+
+        assert api_client.get(url).json()["results"][0]["author"] == "Nakamoto"
+        assert api_client.get(url, {"author": "Nakamoto"}).json()["results"][0]["id"] == story.id
+        assert api_client.get(url, {"author": "Satoshi"}).json()["results"] == []
+        assert api_client.get(reverse("story-detail", kwargs={"pk": story.id})).json()["author"] == "Nakamoto"
+
+    def test_retrieve_story_uses_cache(self, api_client, author, create_story, django_assert_num_queries):
+        _, author = author
+        story = create_story(author=author)
+        url = reverse("story-detail", kwargs={"pk": story.pk})
+
+        with django_assert_num_queries(1):
+            api_client.get(url)
+
+        with django_assert_num_queries(0):
+            response = api_client.get(url)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["title"] == story.title
+
+    def test_retrieve_story_not_modified(self, api_client, author, create_story, django_assert_num_queries):
+        _, author = author
+        story = create_story(author=author)
+        url = reverse("story-detail", kwargs={"pk": story.pk})
+
+        etag = api_client.get(url)["ETag"]
+
+        with django_assert_num_queries(0):
+            response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response["ETag"] == etag
+
+    def test_missing_stories_store_no_stamps(self, authenticated_client, review_url):
+        for story_id in (404, 405):
+            story = authenticated_client.get(reverse("story-detail", kwargs={"pk": story_id}))
+            reviews = authenticated_client.get(review_url(story_id))
+
+            assert story.status_code == reviews.status_code == status.HTTP_404_NOT_FOUND
+
+            assert cache.get(story_stamp_key(story_id)) is None
+            assert cache.get(reviews_stamp_key(story_id)) is None
+
+    def test_story_etag_changes_after_update(self, api_client, author, create_story):
+        user, author = author
+        story = create_story(author=author)
+        url = reverse("story-detail", kwargs={"pk": story.pk})
+
+        etag = api_client.get(url)["ETag"]
+
+        api_client.force_authenticate(user=user)
+        api_client.patch(url, {"title": "Updated Title"}, format="json")
+
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["title"] == "Updated Title"
+        assert response["ETag"] != etag
+
+    def test_list_stories_not_modified(self, api_client, create_story_api, story_data):
+        url = reverse("story-list")
+        create_story_api(story_data)
+
+        first = api_client.get(url)
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+        create_story_api({**story_data, "title": "Another Story"})
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data["results"]) == 2
+
+    @pytest.mark.parametrize("ordering", ["-created_at", "likes", "-dislikes"])
+    def test_list_stories_cursor_pagination(self, api_client, author, ordering):
+        _, author = author
+        Story.objects.bulk_create(
+            Story(title=f"Story {i}", content="Cursor pagination content", author=author, likes=i % 3, dislikes=i % 2)
+            for i in range(45)
+        )
+        url = reverse("story-list")
+
+        response = api_client.get(url, {"pagination": "cursor", "ordering": ordering})
+        first_page = [s["id"] for s in response.data["results"]]
+        seen = list(first_page)
+
+        assert "count" not in response.data
+        assert response.data["previous"] is None
+
+        while response.data["next"]:
+            response = api_client.get(response.data["next"])
+            seen += [s["id"] for s in response.data["results"]]
+
+        tie_breaker = "-id" if ordering.startswith("-") else "id"
+        expected = list(Story.objects.order_by(ordering, tie_breaker).values_list("id", flat=True))
+        assert seen == expected
+
+        # cached pages are served as raw bytes
+        second = api_client.get(api_client.get(url, {"pagination": "cursor", "ordering": ordering}).json()["next"])
+        previous = api_client.get(second.json()["previous"])
+        assert [s["id"] for s in previous.json()["results"]] == first_page
+
+    def test_list_stories_invalid_cursor(self, api_client):
+        response = api_client.get(reverse("story-list"), {"pagination": "cursor", "cursor": "not-a-cursor"})
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_batch_fetch_stories(self, api_client, author, create_story, django_assert_num_queries):
+        _, author = author
+        first, second, third = (create_story(author=author, title=f"Story {i}") for i in range(3))
+        url = reverse("story-batch")
+
+        api_client.get(reverse("story-detail", kwargs={"pk": second.pk}))
+
+        # the cached story is not queried again, the two misses share one query
+        with django_assert_num_queries(1):
+            response = api_client.get(url, {"ids": f"{third.id},{second.id},999,{first.id},{third.id}"})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [s["id"] for s in response.data["results"]] == [third.id, second.id, first.id]
+        assert response.data["missing"] == [999]
+
+        with django_assert_num_queries(0):
+            api_client.get(url, {"ids": f"{first.id},{second.id},{third.id}"})
+
+    @pytest.mark.parametrize("ids", ["", "1,abc", ",".join(str(i) for i in range(1, 52))])
+    def test_batch_fetch_invalid_ids(self, api_client, ids):
+        response = api_client.get(reverse("story-batch"), {"ids": ids})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_list_cache_serves_rendered_bytes(self, api_client, author, create_story, django_assert_num_queries):
+        cache.clear()
+        _, author = author
+        for i in range(10):
+            create_story(author=author, title=f"Story {i}", content="Once upon a time " * 20)
+        url = reverse("story-list")
+
+        first = api_client.get(url)
+
+        with django_assert_num_queries(0):
+            plain = api_client.get(url)
+            gzipped = api_client.get(url, HTTP_ACCEPT_ENCODING="gzip, br")
+
+        assert plain.content == first.content
+        assert plain["Content-Type"] == "application/json"
+        assert gzipped["Content-Encoding"] == "gzip"
+        assert gzip.decompress(gzipped.content) == first.content
+        assert "Accept-Encoding" in plain["Vary"]
+
+        # both codings of the page share one weak ETag, a strong one may only name a single coding
+        assert gzipped["ETag"] == plain["ETag"] == first["ETag"]
+        assert first["ETag"].startswith("W/")
+        response = api_client.get(url, HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=plain["ETag"])
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+        # msgpack is rendered and cached on its own, with the stamp of the page
+        packed = api_client.get(url, HTTP_ACCEPT="application/msgpack")
+        with django_assert_num_queries(0):
+            assert api_client.get(url, HTTP_ACCEPT="application/msgpack").content == packed.content
+
+        assert packed["Content-Type"] == "application/msgpack"
+        assert packed["ETag"] != first["ETag"]
+        assert msgpack.unpackb(packed.content)["results"] == first.json()["results"]
+
+    def test_list_serves_stale_page_while_rebuilding(self, api_client, author, create_story, settings):
+        cache.clear()
+        settings.STORY_LIST_STALE_TTL = 60
+        _, author = author
+        create_story(author=author, title="Old story")
+        url = reverse("story-list")
+
+        api_client.get(url)
+        body_key = list_body_key(list_cache_key(QueryDict()), "json")
+        stamp, _, delta, *body = cache.get(body_key)
+        cache.set(body_key, (stamp, time.time() - 1, delta, *body))
+
+        # written without invalidation, so only the rebuild can pick it up
+        Story.objects.bulk_create([Story(title="New story", content="Fresh content here", author=author)])
+
+        # another worker is already rebuilding: the stale page is served and nothing is rebuilt here
+        acquire(body_key)
+        stale = api_client.get(url)
+        assert [s["title"] for s in stale.json()["results"]] == ["Old story"]
+        assert cache.get(body_key)[1] < time.time()
+        release(body_key)
+
+        stale = api_client.get(url)
+        assert [s["title"] for s in stale.json()["results"]] == ["Old story"]
+
+        # the page was rebuilt after the stale response went out
+        fresh = api_client.get(url)
+        assert {s["title"] for s in fresh.json()["results"]} == {"Old story", "New story"}
+        assert fresh["ETag"] != stale["ETag"]
+        assert cache.get(lock_key(body_key)) is None
+
+    def test_sparse_fieldsets(self, api_client, author, create_story, django_assert_num_queries):
+        cache.clear()
+        _, author = author
+        story = create_story(author=author)
+        url = reverse("story-list")
+
+        with django_assert_num_queries(2) as captured:
+            response = api_client.get(url, {"fields": "title,likes"})
+
+        assert response.data["results"][0] == {"id": story.id, "title": story.title, "likes": 0}
+        select = captured.captured_queries[-1]["sql"]
+        assert '"content"' not in select and "accounts_author" not in select
+
+        response = api_client.get(reverse("story-detail", kwargs={"pk": story.pk}), {"omit": "content,genre"})
+        assert "content" not in response.data and "genre" not in response.data
+        assert response.data["title"] == story.title
+
+        response = api_client.get(reverse("story-batch"), {"ids": story.id, "fields": "author"})
+        assert response.data["results"] == [{"id": story.id, "author": author.pen_name}]
+
+    def test_summary_list_mode(self, api_client, author, create_story, django_assert_num_queries):
+        cache.clear()
+        _, author = author
+        story = create_story(author=author, content="word " * 500)
+
+        with django_assert_num_queries(2) as captured:
+            response = api_client.get(reverse("story-list"), {"mode": "summary"})
+
+        result = response.data["results"][0]
+        assert "content" not in result
+        assert result["author"] == author.pen_name
+        assert result["reading_time"] == 3
+        assert result["excerpt"].endswith("…") and len(result["excerpt"]) <= 201
+        assert '"content"' not in captured.captured_queries[-1]["sql"]
+
+        story.content = "A much shorter story now."
+        story.save(update_fields=["content"])
+        story.refresh_from_db()
+        assert story.excerpt == "A much shorter story now." and story.reading_time == 1
+
+    @pytest.mark.parametrize("serializer_class", [StorySerializer, StorySummarySerializer])
+    def test_values_plan_matches_serializer(self, author, create_story, serializer_class):
+        _, author = author
+        create_story(author=author, content="word " * 300)
+        create_story(author=None, title="Orphaned story")
+        Story.objects.update(average_rating="3.50")
+
+        stories = Story.objects.select_related("author").order_by("id")
+        plan = ValuesPlan(serializer_class())
+
+        expected = JSONRenderer().render(serializer_class(stories, many=True).data)
+        assert JSONRenderer().render(plan.to_representation(plan.values(stories))) == expected
+
     def test_update_own_story(self, api_client, author, create_story):
         """Test author can update their own story"""
         user, author = author
@@ -194,6 +552,40 @@ class TestStoryViewset:
         assert response.status_code == status.HTTP_403_FORBIDDEN
         assert Story.objects.filter(pk=story.pk).exists()
 
+    def test_viewer_state(self, api_client, author, another_author, create_story, django_assert_num_queries):
+        _, author_profile = author
+        stories = [create_story(author=author_profile, title=f"Story {i}") for i in range(5)]
+        Reaction.objects.create(user=another_author, story=stories[0], reaction="like")
+        Rating.objects.create(user=another_author, story=stories[0], rating=4)
+        Rating.objects.create(user=another_author, story=stories[1], rating=2)
+
+        api_client.force_authenticate(user=another_author)
+
+        # count, page, reactions, ratings
+        with django_assert_num_queries(4):
+            response = api_client.get(reverse("story-list"), {"include": "viewer_state"})
+
+        states = {item["id"]: item["viewer_state"] for item in response.data["results"]}
+        assert states[stories[0].id] == {"reaction": "like", "rating": 4}
+        assert states[stories[1].id] == {"reaction": None, "rating": 2}
+        assert states[stories[2].id] == {"reaction": None, "rating": None}
+        assert "private" in response["Cache-Control"]
+
+        response = api_client.get(
+            reverse("story-detail", kwargs={"pk": stories[1].pk}),
+            {"include": "viewer_state", "fields": "title"},
+        )
+        assert response.data == {
+            "id": stories[1].id,
+            "title": "Story 1",
+            "viewer_state": {"reaction": None, "rating": 2},
+        }
+
+        # the shared list cache never holds it
+        api_client.force_authenticate(user=None)
+        response = api_client.get(reverse("story-list"), {"include": "viewer_state"})
+        assert "viewer_state" not in response.json()["results"][0]
+
 
 @pytest.mark.django_db
 class TestReactionView:
@@ -214,6 +606,119 @@ class TestReactionView:
         assert response.status_code == status.HTTP_201_CREATED
         assert story.likes == 1
 
+    def test_reaction_refreshes_cached_story(
+            self,
+            api_client,
+            author,
+            create_story,
+            reaction_url,
+            django_capture_on_commit_callbacks,
+    ):
+        user, author_profile = author
+        story = create_story(author=author_profile)
+        detail_url = reverse("story-detail", kwargs={"pk": story.pk})
+
+        api_client.get(detail_url)
+
+        api_client.force_authenticate(user=user)
+        with django_capture_on_commit_callbacks(execute=True):
+            api_client.post(reaction_url(story.id), {"reaction": "like"}, format="json")
+
+        response = api_client.get(detail_url)
+
+        assert response.data["likes"] == 1
+
+    def test_counter_writes_invalidate_cached_lists(
+            self,
+            api_client,
+            author,
+            another_author,
+            create_story,
+            reaction_url,
+            rating_url,
+            django_capture_on_commit_callbacks,
+    ):
+        _, author_profile = author
+        story = create_story(author=author_profile, genre="mystery")
+        pages = [{}, {"genre": "mystery"}, {"author": "Satoshi"}]
+
+        for params in pages:
+            assert api_client.get(reverse("story-list"), params).json()["results"][0]["likes"] == 0
+
+        api_client.force_authenticate(user=another_author)
+        with django_capture_on_commit_callbacks(execute=True):
+            api_client.post(reaction_url(story.id), {"reaction": "like"}, format="json")
+            api_client.post(rating_url(story.id), {"rating": 5}, format="json")
+
+        for params in pages:
+            result = api_client.get(reverse("story-list"), params).json()["results"][0]
+            assert (result["likes"], result["total_ratings"]) == (1, 1)
+
+    def test_write_behind_reactions(
+            self,
+            api_client,
+            author,
+            another_author,
+            create_story,
+            reaction_url,
+            settings,
+            django_capture_on_commit_callbacks,
+    ):
+        settings.STORY_COUNTERS_WRITE_BEHIND = True
+        user, author_profile = author
+        story = create_story(author=author_profile)
+        detail_url = reverse("story-detail", kwargs={"pk": story.pk})
+
+        with django_capture_on_commit_callbacks(execute=True):
+            api_client.force_authenticate(user=user)
+            api_client.post(reaction_url(story.id), {"reaction": "like"}, format="json")
+            api_client.force_authenticate(user=another_author)
+            api_client.post(reaction_url(story.id), {"reaction": "like"}, format="json")
+            api_client.patch(reaction_url(story.id), {"reaction": "dislike"}, format="json")
+
+        story.refresh_from_db()
+        assert (story.likes, story.dislikes) == (0, 0)
+
+        response = api_client.get(detail_url)
+        assert (response.data["likes"], response.data["dislikes"]) == (1, 1)
+
+        assert flush_counters() == 1
+
+        story.refresh_from_db()
+        assert (story.likes, story.dislikes) == (1, 1)
+
+        response = api_client.get(detail_url)
+        assert (response.data["likes"], response.data["dislikes"]) == (1, 1)
+        assert flush_counters() == 0
+
+    def test_write_behind_falls_back_when_redis_fails(
+            self,
+            api_client,
+            author,
+            another_author,
+            create_story,
+            reaction_url,
+            settings,
+            monkeypatch,
+            django_capture_on_commit_callbacks,
+    ):
+        settings.STORY_COUNTERS_WRITE_BEHIND = True
+        _, author_profile = author
+        story = create_story(author=author_profile)
+
+        def unavailable(alias):
+            raise ConnectionError("Redis is down")
+
+        monkeypatch.setattr(counters, "get_redis_connection", unavailable)
+        api_client.force_authenticate(user=another_author)
+        with django_capture_on_commit_callbacks(execute=True):
+            response = api_client.post(reaction_url(story.id), {"reaction": "like"}, format="json")
+
+        assert response.status_code == status.HTTP_201_CREATED
+        story.refresh_from_db()
+        author_profile.refresh_from_db()
+        assert (story.likes, author_profile.total_likes) == (1, 1)
+
     def test_update_reaction(self, api_client, author, create_story, reaction_url):
         user, author_profile = author
         story = create_story(author=author_profile)
@@ -265,6 +770,65 @@ class TestReviewViewSet:
         assert response.status_code == status.HTTP_201_CREATED
         assert Review.objects.filter(story=story).exists()
 
+    def test_list_reviews_not_modified(self, api_client, author, another_author, create_story, review_url, review_data):
+        user, author_profile = author
+        story = create_story(author=author_profile)
+        Review.objects.create(user=user, story=story, content="First review")
+
+        api_client.force_authenticate(user=user)
+        etag = api_client.get(review_url(story.id))["ETag"]
+
+        response = api_client.get(review_url(story.id), HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+        api_client.force_authenticate(user=another_author)
+        api_client.post(review_url(story.id), review_data, format="json")
+
+        response = api_client.get(review_url(story.id), HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data["results"]) == 2
+
+    def test_list_reviews_matches_serializer(self, api_client, author, create_user, create_story, review_url):
+        user, author_profile = author
+        story = create_story(author=author_profile)
+        for i in range(3):
+            Review.objects.create(user=create_user(), story=story, alias=f"reader {i}", content="Nice story")
+
+        api_client.force_authenticate(user=user)
+        response = api_client.get(review_url(story.id))
+
+        reviews = Review.objects.filter(story=story).select_related("story").order_by("-created_at", "-id")
+        assert response.content == JSONRenderer().render({
+            "next": None, "previous": None, "results": ReviewSerializer(reviews, many=True).data,
+        })
+
+    def test_list_reviews_cursor_pagination(self, api_client, author, create_user, create_story, review_url):
+        user, author_profile = author
+        story = create_story(author=author_profile)
+        Review.objects.bulk_create(
+            Review(user=create_user(), story=story, alias=f"reader {i}", content="Nice story")
+            for i in range(7)
+        )
+
+        api_client.force_authenticate(user=user)
+        response = api_client.get(review_url(story.id), {"page_size": 3})
+        seen = [r["id"] for r in response.data["results"]]
+
+        assert len(seen) == 3
+        assert "count" not in response.data
+
+        while response.data["next"]:
+            response = api_client.get(response.data["next"])
+            seen += [r["id"] for r in response.data["results"]]
+
+        assert seen == list(Review.objects.filter(story=story).order_by("-created_at", "-id").values_list("id", flat=True))
+
+    @pytest.mark.parametrize("page_size, expected", [("3", 3), ("1000", 50), ("abc", 10)])
+    def test_reviews_page_size_is_bounded(self, page_size, expected):
+        request = Request(APIRequestFactory().get("/", {"page_size": page_size}))
+
+        assert ReviewsPagination().get_page_size(request) == expected
+
     def test_update_review_within_30_minutes(self, api_client, author, create_story):
         user, author_profile = author
         story = create_story(author=author_profile)
@@ -350,13 +914,37 @@ class TestRatingAPI:
         assert story.total_ratings == 1
         assert story.average_rating == 4
 
-    def test_update_rating(self, api_client, author, another_author, create_story, rating_url):
+    def test_rating_refreshes_cached_story(
+            self,
+            api_client,
+            author,
+            another_author,
+            create_story,
+            rating_url,
+            django_capture_on_commit_callbacks,
+    ):
         _, author_profile = author
         story = create_story(author=author_profile)
+        detail_url = reverse("story-detail", kwargs={"pk": story.pk})
+
+        api_client.get(detail_url)
+
+        api_client.force_authenticate(user=another_author)
+        with django_capture_on_commit_callbacks(execute=True):
+            api_client.post(rating_url(story.id), {"rating": 4}, format="json")
+
+        response = api_client.get(detail_url)
+
+        assert response.data["total_ratings"] == 1
+        assert response.data["average_rating"] == "4.00"
 
-        Rating.objects.create(user=another_author, story=story, rating=2)
+    def test_update_rating(self, api_client, author, another_author, create_story, rating_url):
+        _, author_profile = author
+        story = create_story(author=author_profile)
 
         api_client.force_authenticate(user=another_author)
+        api_client.post(rating_url(story.id), {"rating": 2}, format="json")
+
         response = api_client.patch(
             rating_url(story.id),
             {"rating": 5},
@@ -368,16 +956,331 @@ class TestRatingAPI:
         assert response.status_code == status.HTTP_200_OK
         assert story.average_rating == 5
 
-    def test_delete_rating(self, api_client, author, another_author, create_story, rating_url):
+    def test_rating_aggregates_and_distribution(self, api_client, author, create_user, create_story, rating_url):
         _, author_profile = author
         story = create_story(author=author_profile)
+        raters = [create_user(is_verified=True) for _ in range(4)]
+
+        for rater, value in zip(raters, [5, 4, 4, 1]):
+            api_client.force_authenticate(user=rater)
+            api_client.post(rating_url(story.id), {"rating": value}, format="json")
+
+        api_client.force_authenticate(user=raters[3])
+        api_client.patch(rating_url(story.id), {"rating": 2}, format="json")
+        api_client.force_authenticate(user=raters[0])
+        api_client.delete(rating_url(story.id))
+
+        story.refresh_from_db()
+        assert (story.total_ratings, story.rating_sum) == (3, 10)
+        assert str(story.average_rating) == "3.33"
+        assert story.bayesian_rating == pytest.approx((10 * 3.0 + 10) / (10 + 3))
+
+        api_client.force_authenticate(user=None)
+        response = api_client.get(reverse("story-rating-distribution", kwargs={"story_id": story.id}))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["distribution"] == {"1": 0, "2": 1, "3": 0, "4": 2, "5": 0}
+        assert response.data["total_ratings"] == 3
+
+    def test_top_rated_prefers_many_good_ratings(self, api_client, author, create_user, create_story, rating_url):
+        _, author_profile = author
+        lucky = create_story(author=author_profile, title="One five star", genre="mystery")
+        loved = create_story(author=author_profile, title="Many good ratings", genre="mystery")
+        comedy = create_story(author=author_profile, title="Comedy", genre="comedy")
+        raters = [create_user(is_verified=True) for _ in range(30)]
+
+        api_client.force_authenticate(user=raters[0])
+        api_client.post(rating_url(lucky.id), {"rating": 5}, format="json")
+        for rater in raters:
+            api_client.force_authenticate(user=rater)
+            api_client.post(rating_url(loved.id), {"rating": 5 if rater.id % 5 else 4}, format="json")
+        api_client.force_authenticate(user=None)
+
+        response = api_client.get(reverse("story-top-rated"), {"genre": "mystery"})
+        assert [s["title"] for s in response.data["results"]] == ["Many good ratings", "One five star"]
+
+        response = api_client.get(reverse("story-list"), {"ordering": "-bayesian_rating"})
+        assert [s["title"] for s in response.data["results"]] == ["Many good ratings", "One five star", "Comedy"]
 
-        Rating.objects.create(user=another_author, story=story, rating=3)
+        response = api_client.get(reverse("story-top-rated"))
+        assert [s["id"] for s in response.data["results"]] == [loved.id, lucky.id, comedy.id]
+        assert api_client.get(reverse("story-top-rated"), {"genre": "poetry"}).status_code == 400
+
+    def test_delete_rating(self, api_client, author, another_author, create_story, rating_url):
+        _, author_profile = author
+        story = create_story(author=author_profile)
 
         api_client.force_authenticate(user=another_author)
+        api_client.post(rating_url(story.id), {"rating": 3}, format="json")
+
         response = api_client.delete(rating_url(story.id))
 
         story.refresh_from_db()
 
         assert response.status_code == status.HTTP_204_NO_CONTENT
         assert story.total_ratings == 0
+
+    def test_delete_rating_on_drifted_aggregates(self, api_client, author, another_author, create_story, rating_url):
+        _, author_profile = author
+        story = create_story(author=author_profile)
+
+        api_client.force_authenticate(user=another_author)
+        api_client.post(rating_url(story.id), {"rating": 3}, format="json")
+        Story.objects.filter(pk=story.pk).update(total_ratings=0, rating_sum=0, ratings_3=0)
+
+        response = api_client.delete(rating_url(story.id))
+        story.refresh_from_db()
+
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+        assert (story.total_ratings, story.rating_sum, story.ratings_3) == (0, 0, 0)
+
+    def test_story_edit_keeps_ratings_that_land_meanwhile(self, author, another_author, create_story):
+        _, author_profile = author
+        story = create_story(author=author_profile)
+        serializer = StorySerializer(story, data={"title": "Renamed"}, partial=True)
+        serializer.is_valid(raise_exception=True)
+
+        Rating.objects.create(user=another_author, story=story, rating=4)
+        update_rating_aggregates(story.id, added=4)
+        serializer.save()
+        story.refresh_from_db()
+
+        assert story.title == "Renamed"
+        assert (story.total_ratings, story.rating_sum, story.ratings_4) == (1, 4, 1)
+
+
+@pytest.mark.django_db
+class TestTrending:
+
+    def test_trending_ranks_recent_activity(
+            self,
+            api_client,
+            author,
+            another_author,
+            create_story,
+            reaction_url,
+            review_url,
+            django_capture_on_commit_callbacks,
+    ):
+        user, author_profile = author
+        quiet = create_story(author=author_profile, title="Quiet", genre="comedy")
+        liked = create_story(author=author_profile, title="Liked", genre="mystery")
+        reviewed = create_story(author=author_profile, title="Reviewed", genre="mystery")
+
+        with django_capture_on_commit_callbacks(execute=True):
+            api_client.force_authenticate(user=user)
+            api_client.post(reaction_url(liked.id), {"reaction": "like"}, format="json")
+            api_client.post(reaction_url(reviewed.id), {"reaction": "like"}, format="json")
+            api_client.force_authenticate(user=another_author)
+            api_client.post(review_url(reviewed.id), {"content": "Loved every page of it"}, format="json")
+
+        url = reverse("story-trending")
+        api_client.force_authenticate(user=None)
+
+        response = api_client.get(url)
+        assert [s["title"] for s in response.data["results"]] == ["Reviewed", "Liked"]
+
+        response = api_client.get(url, {"genre": "comedy"})
+        assert response.data["results"] == []
+
+        response = api_client.get(url, {"genre": "mystery", "limit": 1, "fields": "title"})
+        assert response.data["results"] == [{"id": reviewed.id, "title": "Reviewed"}]
+
+        assert quiet.id not in trending_ids()
+        assert api_client.get(url, {"genre": "unknown"}).status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_older_activity_decays(self, create_story, author, monkeypatch):
+        _, author_profile = author
+        old, new = create_story(author=author_profile), create_story(author=author_profile)
+        now = time.time()
+
+        # two reviews two half-lives ago weigh half of one like now
+        monkeypatch.setattr(trending.time, "time", lambda: now - 2 * trending.TRENDING_HALF_LIFE)
+        trending._increment(old.id, old.genre, trending.EVENT_WEIGHTS["review"])
+        monkeypatch.setattr(trending.time, "time", lambda: now)
+        trending._increment(new.id, new.genre, trending.EVENT_WEIGHTS["like"])
+
+        assert trending_ids() == [new.id, old.id]
+
+        # compaction rescales the scores to the current time and keeps the order
+        trending.compact()
+        redis = get_redis_connection("default")
+
+        assert trending_ids() == [new.id, old.id]
+        assert redis.zscore(trending.trending_key(), new.id) == pytest.approx(1.0)
+        assert redis.zscore(trending.trending_key(), old.id) == pytest.approx(0.5)
+
+    def test_deleted_stories_leave_trending(self, api_client, author, create_story):
+        user, author_profile = author
+        story = create_story(author=author_profile)
+        trending._increment(story.id, story.genre, 1.0)
+
+        api_client.force_authenticate(user=user)
+        api_client.delete(reverse("story-detail", kwargs={"pk": story.pk}))
+
+        assert trending_ids() == []
+
+
+@pytest.mark.django_db
+class TestAuthorStats:
+
+    def test_stats_follow_story_writes(
+            self,
+            api_client,
+            author,
+            another_author,
+            create_story_api,
+            story_data,
+            reaction_url,
+            review_url,
+            rating_url,
+    ):
+        user, author_profile = author
+        kept = create_story_api(story_data).data
+        deleted = create_story_api({**story_data, "title": "Deleted"}).data
+
+        api_client.force_authenticate(user=another_author)
+        api_client.post(reaction_url(kept["id"]), {"reaction": "like"}, format="json")
+        api_client.post(rating_url(kept["id"]), {"rating": 4}, format="json")
+        api_client.post(review_url(kept["id"]), {"content": "Loved every page of it"}, format="json")
+        api_client.post(reaction_url(deleted["id"]), {"reaction": "dislike"}, format="json")
+        api_client.post(rating_url(deleted["id"]), {"rating": 1}, format="json")
+
+        api_client.force_authenticate(user=user)
+        api_client.delete(reverse("story-detail", kwargs={"pk": deleted["id"]}))
+
+        response = api_client.get(reverse("author-stats"))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == {
+            "pen_name": "Satoshi",
+            "total_stories": 1,
+            "total_likes": 1,
+            "total_dislikes": 0,
+            "total_reviews": 1,
+            "total_ratings": 1,
+            "mean_rating": "4.00",
+        }
+
+    def test_public_stats_by_pen_name(self, api_client, author, django_assert_num_queries):
+        with django_assert_num_queries(1):
+            response = api_client.get(reverse("public-author-stats", kwargs={"pen_name": "satoshi"}))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["total_stories"] == 0
+
+        response = api_client.get(reverse("public-author-stats", kwargs={"pen_name": "Nobody"}))
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_own_stats_require_an_author_profile(self, authenticated_client):
+        response = authenticated_client.get(reverse("author-stats"))
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_reconcile_fixes_drift(self, author, another_author, create_story):
+        user, author_profile = author
+        story = create_story(author=author_profile, likes=3, total_ratings=2, rating_sum=7)
+        Review.objects.create(user=another_author, story=story, content="Loved every page of it")
+        Author.objects.filter(pk=author_profile.pk).update(total_likes=99, total_reviews=5)
+
+        reconcile_author_counters()
+        author_profile.refresh_from_db()
+
+        assert (author_profile.total_stories, author_profile.total_likes, author_profile.total_reviews) == (1, 3, 1)
+        assert (author_profile.total_ratings, author_profile.rating_sum) == (2, 7)
+
+
+@pytest.mark.django_db
+class TestOwnershipChecks:
+
+    def test_checks_compare_ids_without_queries(self, author, another_author, create_story, django_assert_num_queries):
+        user, author_profile = author
+        story = Story.objects.get(pk=create_story(author=author_profile).pk)
+        review = Review.objects.get(pk=Review.objects.create(user=another_author, story=story, content="Great").pk)
+
+        request = Request(APIRequestFactory().delete("/"))
+        # loaded the way CachedJWTAuthentication loads it
+        request.user = User.objects.select_related("author").get(pk=user.pk)
+
+        with django_assert_num_queries(0):
+            assert IsAuthor().has_permission(request, None)
+            assert IsStoryOwner().has_object_permission(request, None, story)
+            assert CanDeleteStory().has_object_permission(request, None, story)
+            assert not IsReviewOwner().has_object_permission(request, None, review)
+            assert not CanDeleteReview().has_object_permission(request, None, review)
+
+    def test_orphaned_story_has_no_owner(self, author, create_story):
+        user, _ = author
+        story = create_story(author=None)
+
+        request = Request(APIRequestFactory().delete("/"))
+        request.user = user
+
+        assert not IsStoryOwner().has_object_permission(request, None, story)
+        assert not CanDeleteStory().has_object_permission(request, None, story)
+
+
+@pytest.mark.django_db
+class TestQueryPlans:
+    """
+    Checks the list access paths are served by their indexes.
+    PostgreSQL would seq scan tables this small, so sequential scans are disabled for the check.
+    """
+
+    @pytest.fixture(autouse=True)
+    def disable_seqscan(self):
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+
+    def assert_uses_index(self, queryset, index_name):
+        plan = queryset.explain()
+        assert index_name in plan, plan
+
+    @pytest.mark.parametrize("ordering, index_name", [
+        (("-created_at", "-id"), "story_created_idx"),
+        (("likes", "id"), "story_likes_idx"),
+        (("-dislikes", "-id"), "story_dislikes_idx"),
+    ])
+    def test_story_list_orderings(self, ordering, index_name):
+        self.assert_uses_index(Story.objects.order_by(*ordering)[:20], index_name)
+
+    def test_story_author_list(self, author):
+        _, author = author
+        self.assert_uses_index(
+            Story.objects.filter(author=author).order_by("-created_at", "-id")[:20],
+            "story_author_created_idx",
+        )
+
+    def test_story_reviews_list(self, author, create_story):
+        _, author = author
+        story = create_story(author=author)
+        self.assert_uses_index(
+            Review.objects.filter(story=story).order_by("-created_at", "-id")[:10],
+            "review_story_created_idx",
+        )
+
+    def test_top_rated(self):
+        self.assert_uses_index(Story.objects.order_by("-bayesian_rating", "-id")[:20], "story_bayesian_idx")
+        self.assert_uses_index(
+            Story.objects.filter(genre="mystery").order_by("-bayesian_rating", "-id")[:20],
+            "story_genre_bayesian_idx",
+        )
+
+    @pytest.mark.skipif(connection.vendor != "postgresql", reason="iexact only compiles to UPPER() on PostgreSQL")
+    def test_story_genre_filter(self):
+        self.assert_uses_index(
+            Story.objects.filter(genre__iexact="Mystery").order_by("-created_at", "-id")[:20],
+            "story_genre_upper_created_idx",
+        )
+
+    @pytest.mark.skipif(connection.vendor != "postgresql", reason="the GIN index only exists on PostgreSQL")
+    def test_story_search(self):
+        self.assert_uses_index(
+            PostgresSearchBackend().search(Story.objects.all(), ["dragon"]),
+            SEARCH_INDEX,
+        )
+
+    @pytest.mark.skipif(connection.vendor != "postgresql", reason="iexact only compiles to UPPER() on PostgreSQL")
+    def test_author_pen_name_filter(self):
+        self.assert_uses_index(Author.objects.filter(pen_name__iexact="satoshi"), "author_pen_name_upper_idx")
@@ -1,4 +1,4 @@
-from rest_framework.throttling import UserRateThrottle , AnonRateThrottle   
+from core.throttling import UserRateThrottle, AnonRateThrottle
 
 
 class StoryAnonThrottle(AnonRateThrottle):
@@ -0,0 +1,145 @@
+"""
+Trending stories, ranked by time-decayed activity in Redis sorted sets (one global, one per genre).
+
+- every reaction, rating and review adds its weight to the story's score, an event that happened half_life
+  seconds ago counts half as much as one happening now
+- decay uses forward decay: instead of lowering every score over time, a new event is added with weight
+  2 ** ((now - epoch) / half_life), which keeps the ordering identical and makes every update a single ZINCRBY
+- compact() (celery beat) divides every score by the weight of "now" and moves the epoch, so scores stay small,
+  and trims each set to its top TRENDING_SIZE stories
+- reads are a ZREVRANGE, the Story table is never scanned or sorted to rank
+"""
+
+import time
+from django.db import transaction
+from django_redis import get_redis_connection
+from .models import Story
+
+
+TRENDING_HALF_LIFE = 60 * 60 * 6
+TRENDING_SIZE = 1000
+TRENDING_MIN_SCORE = 0.01
+
+EVENT_WEIGHTS = {
+    "like": 1.0,
+    "dislike": 0.5,
+    "rating": 1.5,
+    "review": 2.0,
+}
+
+EPOCH_KEY = "trending:epoch"
+
+# KEYS: epoch, sorted sets. ARGV: now, half life, weight, story id
+INCREMENT_SCRIPT = """
+local epoch = tonumber(redis.call('GET', KEYS[1]))
+if not epoch then
+    epoch = tonumber(ARGV[1])
+    redis.call('SET', KEYS[1], ARGV[1])
+end
+
+local score = tonumber(ARGV[3]) * math.pow(2, (tonumber(ARGV[1]) - epoch) / tonumber(ARGV[2]))
+for i = 2, #KEYS do
+    redis.call('ZINCRBY', KEYS[i], score, ARGV[4])
+end
+return tostring(score)
+"""
+
+# KEYS: epoch, sorted sets. ARGV: now, half life, size, min score
+COMPACT_SCRIPT = """
+local epoch = tonumber(redis.call('GET', KEYS[1]))
+if not epoch then
+    return 0
+end
+
+local factor = math.pow(2, (tonumber(ARGV[1]) - epoch) / tonumber(ARGV[2]))
+local size = tonumber(ARGV[3])
+local min_score = tonumber(ARGV[4])
+local removed = 0
+
+for i = 2, #KEYS do
+    redis.call('ZREMRANGEBYRANK', KEYS[i], 0, -(size + 1))
+
+    local items = redis.call('ZRANGE', KEYS[i], 0, -1, 'WITHSCORES')
+    for j = 1, #items, 2 do
+        local score = tonumber(items[j + 1]) / factor
+        if score < min_score then
+            redis.call('ZREM', KEYS[i], items[j])
+            removed = removed + 1
+        else
+            redis.call('ZADD', KEYS[i], score, items[j])
+        end
+    end
+end
+
+redis.call('SET', KEYS[1], ARGV[1])
+return removed
+"""
+
+
+def trending_key(genre=None):
+    return f"trending:genre:{genre}" if genre else "trending:all"
+
+
+def all_trending_keys():
+    return [trending_key()] + [trending_key(genre) for genre, _ in Story.GENRE_CHOICES]
+
+
+def record_activity(story, event):
+    """
+    Scores the event once the transaction commits, a failure to reach Redis never fails the write.
+    """
+    story_id, genre = story.id, story.genre
+    transaction.on_commit(lambda: _increment(story_id, genre, EVENT_WEIGHTS[event]), robust=True)
+
+
+def _increment(story_id, genre, weight):
+    redis = get_redis_connection("default")
+    increment = redis.register_script(INCREMENT_SCRIPT)
+
+    increment(
+        keys=[EPOCH_KEY, trending_key(), trending_key(genre)],
+        args=[time.time(), TRENDING_HALF_LIFE, weight, story_id],
+    )
+
+
+def trending_ids(genre=None, limit=20):
+    redis = get_redis_connection("default")
+    return [int(story_id) for story_id in redis.zrevrange(trending_key(genre), 0, limit - 1)]
+
+
+def move_story(story_id, old_genre, new_genre):
+    """
+    Carries a story's score over to its new genre set.
+    """
+    redis = get_redis_connection("default")
+
+    score = redis.zscore(trending_key(old_genre), story_id)
+    if score is None:
+        return
+
+    pipe = redis.pipeline()
+    pipe.zrem(trending_key(old_genre), story_id)
+    pipe.zincrby(trending_key(new_genre), score, story_id)
+    pipe.execute()
+
+
+def forget_stories(story_ids):
+    if not story_ids:
+        return
+
+    redis = get_redis_connection("default")
+
+    pipe = redis.pipeline()
+    for key in all_trending_keys():
+        pipe.zrem(key, *story_ids)
+    pipe.execute()
+
+
+def compact():
+    redis = get_redis_connection("default")
+    compact_sets = redis.register_script(COMPACT_SCRIPT)
+
+    return compact_sets(
+        keys=[EPOCH_KEY] + all_trending_keys(),
+        args=[time.time(), TRENDING_HALF_LIFE, TRENDING_SIZE, TRENDING_MIN_SCORE],
+    )
@@ -2,7 +2,7 @@
 
 from rest_framework_nested import routers
 from django.urls import path
-from .views import StoryViewSet, ReactionView, ReviewViewSet, RatingView
+from .views import StoryViewSet, ReactionView, ReviewViewSet, RatingView, RatingDistributionView
 
 
 router = routers.DefaultRouter()
@@ -16,6 +16,7 @@ stories_router.register("reviews", ReviewViewSet, basename="story-review")
 urlpatterns = router.urls + stories_router.urls + [
     path("stories/<int:story_id>/reaction/", ReactionView.as_view(), name="story-reaction"),
     path("stories/<int:story_id>/rating/", RatingView.as_view(), name="story-rating"),
+    path("stories/<int:story_id>/rating/distribution/", RatingDistributionView.as_view(), name="story-rating-distribution"),
 ]
 
 
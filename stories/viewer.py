@@ -0,0 +1,33 @@
+"""
+Viewer state: the current user's reaction and rating on each story of a response (?include=viewer_state).
+
+- the shared caches (story pages, rendered list bodies) never contain it, it's looked up per request for the
+  stories on the page and added to the cached data
+- one query per table, whatever the page size, each a lookup on its unique (user, story) index
+- responses carrying it are private to the user, they skip the shared list cache and the conditional validators
+"""
+
+from .models import Reaction, Rating
+
+
+VIEWER_STATE = "viewer_state"
+
+
+def wants_viewer_state(request):
+    includes = ",".join(request.query_params.getlist("include")).split(",")
+    return VIEWER_STATE in includes and request.user.is_authenticated
+
+
+def add_viewer_state(results, user):
+    story_ids = [item["id"] for item in results]
+
+    reactions = dict(Reaction.objects.filter(user=user, story_id__in=story_ids).values_list("story_id", "reaction"))
+    ratings = dict(Rating.objects.filter(user=user, story_id__in=story_ids).values_list("story_id", "rating"))
+
+    for item in results:
+        item[VIEWER_STATE] = {
+            "reaction": reactions.get(item["id"]),
+            "rating": ratings.get(item["id"]),
+        }
+
+    return results
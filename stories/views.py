@@ -3,23 +3,51 @@ from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.decorators import action
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.filters import SearchFilter, OrderingFilter
-from rest_framework.throttling import AnonRateThrottle, UserRateThrottle
-from django.db.models import F
 from django.db import transaction
 from django.shortcuts import get_object_or_404
-from django.db.models import Avg, Count
+from django.conf import settings
 from django.core.cache import cache
+from django.utils.cache import patch_cache_control, patch_vary_headers
 from datetime import timedelta
 from django.utils import timezone
+import time
+from accounts.models import Author
+from accounts.identity import is_story_author
 from accounts.permissions import IsVerified
-from .serializers import StorySerializer, ReactionSerializer, ReviewSerializer, RatingSerializer
-from .models import Story, Reaction, Review, Rating
+from core.conditional import validators_for, set_validators, conditional_response
+from core.serializers import sparse_fieldset, ValuesPlan
+from core.mixins import ValuesListModelMixin
+from core.responses import pack_body, body_response, call_after_response
+from core.stampede import acquire, release, wait_for, single_flight, refresh_due
+from core.throttling import AnonRateThrottle, UserRateThrottle
+from core.shedding import LoadSheddingMixin, ServiceOverloaded
+from .serializers import StorySerializer, StorySummarySerializer, ReactionSerializer, ReviewSerializer, RatingSerializer
+from .models import Story, Reaction, Review, Rating, RATING_STAR_FIELDS
 from .permissions import IsAuthor, IsStoryOwner, CanDeleteStory, IsReviewOwner, CanDeleteReview
-from .pagination import ReviewsPagination
-from .filters import StoryFilter 
+from .pagination import ReviewsPagination, StoryCursorPagination, TopRatedPagination
+from .filters import StoryFilter, StorySearchFilter, StoryOrderingFilter
+from .cache import (
+    LIST_CACHE_TTL,
+    LIST_CACHE_FORMATS,
+    list_cache_key,
+    list_body_key,
+    tags_for_story,
+    bump_tags,
+    story_cache_key,
+    cache_story,
+    get_cached_stories,
+    refresh_story,
+    story_stamp_key,
+    reviews_stamp_key,
+    get_story_stamp,
+    touch_stamp,
+)
+from .counters import update_reaction_counters, update_rating_aggregates, update_author_counters, authors_of, merge_pending
+from .trending import record_activity, trending_ids, move_story, forget_stories
+from .viewer import wants_viewer_state, add_viewer_state
 from .throttles import (
     StoryAnonThrottle,
     StoryCreateThrottle,
@@ -33,13 +61,24 @@ from .throttles import (
     RatingSustainedThrottle,
 )
 
+MAX_BATCH_IDS = 50
+MAX_TRENDING = 50
+
+# list pages past this one are shed first under overload, an OFFSET that deep is expensive
+DEEP_PAGE = 10
+
+
+def list_validators(request, stamp):
+    # a list page is served gzipped or not from the same stamp (core/responses.py), so its ETag is weak
+    return validators_for(request, stamp, "stories", weak=True)
+
 """"
 - All users, authenticated or not, can read stories
 - Only authors can create story 
 - Any update can only be done by story author
 - Delete can be done by the story author, moderator, or admin
 """
-class StoryViewSet(ModelViewSet):
+class StoryViewSet(LoadSheddingMixin, ValuesListModelMixin, ModelViewSet):
     queryset =Story.objects.all().select_related("author")
     serializer_class = StorySerializer
 
@@ -47,18 +86,36 @@ class StoryViewSet(ModelViewSet):
 
     filter_backends = [
         DjangoFilterBackend,
-        SearchFilter,
-        OrderingFilter,
+        StorySearchFilter,
+        StoryOrderingFilter,
     ]
 
     filterset_class = StoryFilter
 
-    search_fields = ["title", "content"]
-    ordering_fields = ["created_at", "likes", "dislikes"]
+    ordering_fields = ["created_at", "likes", "dislikes", "bayesian_rating"]
     ordering = ["-created_at"]
 
+    # the list only selects the columns the serializer renders, plus the keyset pagination fields
+    values_extra_columns = ordering_fields
+
+    def get_serializer_class(self):
+        # ?mode=summary lists cards with an excerpt and reading time instead of the full content
+        if self.action == "list" and self.request.query_params.get("mode") == "summary":
+            return StorySummarySerializer
+        return super().get_serializer_class()
+
+    @property
+    def paginator(self):
+        # ?pagination=cursor switches the list to keyset pages, page numbers stay the default
+        if not hasattr(self, "_paginator"):
+            if self.request.query_params.get("pagination") == "cursor":
+                self._paginator = StoryCursorPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
     def get_throttles(self):
-        if self.action in ["list", "retrieve"]:
+        if self.action in ["list", "retrieve", "batch", "trending", "top_rated"]:
             return [StoryAnonThrottle(), StoryUserThrottle()]
 
         if self.action == "create":
@@ -69,8 +126,26 @@ class StoryViewSet(ModelViewSet):
 
         return [UserRateThrottle()]
 
+    @classmethod
+    def is_low_priority(cls, request, action):
+        # searches and deep page-number pages, the rest of the list is cheap or cached
+        if action != "list":
+            return False
+
+        try:
+            page = int(request.GET.get("page", 1))
+        except ValueError:
+            page = 1
+
+        return bool(request.GET.get("search")) or page > DEEP_PAGE
+
+    def check_load(self, request):
+        # list() may still serve a shed page from its cache
+        if self.action != "list":
+            super().check_load(request)
+
     def get_permissions(self):
-        if self.action in ["list", "retrieve"]:
+        if self.action in ["list", "retrieve", "batch", "trending", "top_rated"]:
             return [AllowAny()]
 
         if self.action == "create":
@@ -86,24 +161,236 @@ class StoryViewSet(ModelViewSet):
     
     
     def list(self, request, *args, **kwargs):
-        cache_key = f"stories:list:{request.query_params.urlencode()}"
-        data = cache.get(cache_key)
+        shed_wait = getattr(request, "shed_load", None)
+        cache_key = list_cache_key(request.query_params)
+        stamp_key = f"{cache_key}:stamp"
+        renderer_format = request.accepted_renderer.format
 
-        if data:
-            return Response(data)
+        if shed_wait is not None and (wants_viewer_state(request) or renderer_format not in LIST_CACHE_FORMATS):
+            raise ServiceOverloaded(shed_wait)
+
+        if wants_viewer_state(request):
+            return self._viewer_list(request)
+
+        stamp = cache.get(stamp_key)
+        if stamp is not None:
+            not_modified = conditional_response(request, *list_validators(request, stamp))
+            if not_modified is not None:
+                return not_modified
+
+        if renderer_format not in LIST_CACHE_FORMATS:
+            return self._build_list(request, stamp)
+
+        body_key = list_body_key(cache_key, renderer_format)
+        entry = cache.get(body_key)
+
+        # overloaded: a low priority page is served from the cache however stale, or refused
+        if shed_wait is not None:
+            if entry is None:
+                raise ServiceOverloaded(shed_wait)
+            return set_validators(body_response(request, *entry[3:]), *list_validators(request, entry[0]))
+
+        # single flight: one worker builds a missing page, the others wait for it
+        locked = False
+        if entry is None:
+            locked = acquire(body_key)
+            if not locked:
+                entry = wait_for(body_key)
+
+        if entry is None:
+            return self._build_list(request, stamp, body_key, stamp_key, locked)
+
+        stamp, expires_at, delta, *body = entry
+        response = set_validators(body_response(request, *body), *list_validators(request, stamp))
+
+        # early refresh, or a stale page served while it's rebuilt, after the response is sent
+        if refresh_due(expires_at, delta) and acquire(body_key):
+            call_after_response(response, lambda: self._rebuild_list(request, body_key, stamp_key))
 
-        response = super().list(request, *args, **kwargs)
-        cache.set(cache_key, response.data, 300)
         return response
-    
+
+    def _build_list(self, request, stamp, body_key=None, stamp_key=None, locked=False):
+        started = time.monotonic()
+
+        try:
+            response = super().list(request)
+        except Exception:
+            if locked:
+                release(body_key)
+            raise
+
+        merge_pending(response.data["results"])
+
+        # other formats of the page may be cached already, they share its stamp
+        if stamp is None:
+            stamp = time.time_ns()
+
+        if body_key:
+            def store(rendered):
+                entry = (stamp, time.time() + LIST_CACHE_TTL, time.monotonic() - started, *pack_body(rendered))
+                cache.set_many({body_key: entry, stamp_key: stamp}, LIST_CACHE_TTL + settings.STORY_LIST_STALE_TTL)
+                if locked:
+                    release(body_key)
+
+            response.add_post_render_callback(store)
+
+        patch_vary_headers(response, ["Accept-Encoding"])
+        return set_validators(response, *list_validators(request, stamp))
+
+    def _rebuild_list(self, request, body_key, stamp_key):
+        try:
+            response = self._build_list(request, time.time_ns(), body_key, stamp_key, locked=True)
+            self.finalize_response(request, response).render()
+        finally:
+            release(body_key)
+
+    def _viewer_list(self, request):
+        response = super().list(request)
+
+        add_viewer_state(merge_pending(response.data["results"]), request.user)
+
+        patch_cache_control(response, private=True)
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        story_id = kwargs["pk"]
+        viewer_state = wants_viewer_state(request)
+        validators = validators_for(request, get_story_stamp(story_stamp_key(story_id), story_id), "story", story_id)
+
+        if not viewer_state:
+            not_modified = conditional_response(request, *validators)
+            if not_modified is not None:
+                return not_modified
+
+        data = cache.get(story_cache_key(story_id))
+
+        if data is None:
+            data = single_flight(story_cache_key(story_id), lambda: cache_story(self.get_object(), replace=False))
+
+        merge_pending([data])
+        data = sparse_fieldset(data, request)
+
+        if viewer_state:
+            response = Response(add_viewer_state([data], request.user)[0])
+            patch_cache_control(response, private=True)
+            return response
+
+        return set_validators(Response(data), *validators)
+
+    @action(detail=False, methods=["get"])
+    def batch(self, request):
+        story_ids = self._batch_ids(request)
+        found = get_cached_stories(story_ids)
+
+        results = merge_pending([found[story_id] for story_id in story_ids if story_id in found])
+        results = [sparse_fieldset(item, request) for item in results]
+
+        return Response({
+            "results": results,
+            "missing": [story_id for story_id in story_ids if story_id not in found],
+        })
+
+    @action(detail=False, methods=["get"])
+    def trending(self, request):
+        genre = self._genre(request)
+
+        try:
+            limit = min(max(int(request.query_params.get("limit", 20)), 1), MAX_TRENDING)
+        except ValueError:
+            raise ValidationError({"limit": "limit must be a number."})
+
+        story_ids = trending_ids(genre, limit)
+        found = get_cached_stories(story_ids)
+
+        # deleted stories still ranked are dropped from the sets
+        forget_stories([story_id for story_id in story_ids if story_id not in found])
+
+        results = merge_pending([found[story_id] for story_id in story_ids if story_id in found])
+        return Response({"results": [sparse_fieldset(item, request) for item in results]})
+
+    @action(detail=False, methods=["get"], url_path="top-rated")
+    def top_rated(self, request):
+        # exact genre match, so the page is a range scan of story_genre_bayesian_idx (or story_bayesian_idx)
+        queryset = Story.objects.all()
+        genre = self._genre(request)
+        if genre:
+            queryset = queryset.filter(genre=genre)
+
+        plan = ValuesPlan(self.get_serializer())
+        paginator = TopRatedPagination()
+        page = paginator.paginate_queryset(plan.values(queryset, "bayesian_rating"), request, view=self)
+
+        return paginator.get_paginated_response(plan.to_representation(page))
+
+    def _genre(self, request):
+        genre = request.query_params.get("genre", "").lower() or None
+        if genre and genre not in dict(Story.GENRE_CHOICES):
+            raise ValidationError({"genre": "Unknown genre."})
+        return genre
+
+    def _batch_ids(self, request):
+        raw = ",".join(request.query_params.getlist("ids"))
+
+        try:
+            story_ids = [int(value) for value in raw.split(",") if value.strip()]
+        except ValueError:
+            raise ValidationError({"ids": "Provide a comma separated list of story ids."})
+
+        # duplicates are dropped, the order of the request is kept
+        story_ids = list(dict.fromkeys(story_ids))
+
+        if not story_ids:
+            raise ValidationError({"ids": "Provide at least one story id."})
+
+        if len(story_ids) > MAX_BATCH_IDS:
+            raise ValidationError({"ids": f"A batch can contain at most {MAX_BATCH_IDS} stories."})
+
+        return story_ids
+
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user.author)
-        cache.delete("stories:list*")
+        author = self.request.user.author
+
+        with transaction.atomic():
+            instance = serializer.save(author=author)
+            update_author_counters(Author.objects.filter(pk=author.pk), total_stories=1)
+
+        bump_tags(tags_for_story(instance))
 
     def perform_update(self, serializer):
+        old_tags = tags_for_story(serializer.instance)
+        old_genre = serializer.instance.genre
         instance = serializer.save()
-        cache.delete("stories:list*")
-        cache.delete(f"story:{instance.id}")
+
+        if instance.genre != old_genre:
+            move_story(instance.id, old_genre, instance.genre)
+
+        # re-read rather than caching the edited copy, its counters may have moved since it was loaded
+        bump_tags(old_tags)
+        refresh_story(instance.id)
+        touch_stamp(reviews_stamp_key(instance.id))
+
+    def perform_destroy(self, instance):
+        tags = tags_for_story(instance)
+        story_id = instance.id
+
+        with transaction.atomic():
+            if instance.author_id:
+                update_author_counters(
+                    Author.objects.filter(pk=instance.author_id),
+                    total_stories=-1,
+                    total_likes=-instance.likes,
+                    total_dislikes=-instance.dislikes,
+                    total_reviews=-instance.reviews.count(),
+                    total_ratings=-instance.total_ratings,
+                    rating_sum=-instance.rating_sum,
+                )
+            instance.delete()
+
+        bump_tags(tags)
+        forget_stories([story_id])
+        cache.delete(story_cache_key(story_id))
+        touch_stamp(story_stamp_key(story_id))
+        touch_stamp(reviews_stamp_key(story_id))
 
 
 
@@ -140,12 +427,8 @@ class ReactionView(APIView):
                 status=status.HTTP_409_CONFLICT
             )
         
-        if reaction_type == "like":
-            Story.objects.filter(id=story.id).update(likes=F("likes") + 1)
-        else:
-            Story.objects.filter(id=story.id).update(dislikes=F("dislikes") + 1)
-
-        
+        update_reaction_counters(story.id, added=reaction_type)
+        record_activity(story, reaction_type)
 
         return Response(
             {"message": "Reaction added"},
@@ -174,17 +457,9 @@ class ReactionView(APIView):
                 status=status.HTTP_200_OK
             )
 
-        # decrement old
-        if reaction.reaction == "like":
-            Story.objects.filter(id=story.id, likes__gt=0).update(likes=F("likes") - 1)
-        else:
-            Story.objects.filter(id=story.id, dislikes__gt=0).update(dislikes=F("dislikes") - 1)
-
-        # increment new
-        if new_reaction == "like":
-            Story.objects.filter(id=story.id).update(likes=F("likes") + 1)
-        else:
-            Story.objects.filter(id=story.id).update(dislikes=F("dislikes") + 1)
+        # decrement old, increment new
+        update_reaction_counters(story.id, added=new_reaction, removed=reaction.reaction)
+        record_activity(story, new_reaction)
 
         reaction.reaction = new_reaction
         reaction.save(update_fields=["reaction"])
@@ -203,18 +478,16 @@ class ReactionView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        if reaction.reaction == "like":
-            Story.objects.filter(id=story.id, likes__gt=0).update(likes=F("likes") - 1)
-        else:
-            Story.objects.filter(id=story.id, dislikes__gt=0).update(dislikes=F("dislikes") - 1)
+        update_reaction_counters(story.id, removed=reaction.reaction)
 
         reaction.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class ReviewViewSet(ModelViewSet):
+class ReviewViewSet(LoadSheddingMixin, ValuesListModelMixin, ModelViewSet):
     serializer_class = ReviewSerializer
     pagination_class = ReviewsPagination
+    low_priority_actions = ("list", "retrieve")
 
     http_method_names = ['get', 'post', 'patch', 'delete']
 
@@ -241,6 +514,17 @@ class ReviewViewSet(ModelViewSet):
             return [CanDeleteReview()]
         return [IsAuthenticated()]
 
+    def list(self, request, *args, **kwargs):
+        story_id = self.kwargs.get("story_pk")
+        validators = validators_for(request, get_story_stamp(reviews_stamp_key(story_id), story_id), "reviews", story_id)
+
+        not_modified = conditional_response(request, *validators)
+        if not_modified is not None:
+            return not_modified
+
+        response = super().list(request, *args, **kwargs)
+        return set_validators(response, *validators)
+
     def perform_create(self, serializer):
         story = get_object_or_404(Story, id=self.kwargs.get("story_pk"))
         serializer = serializer.__class__(
@@ -248,7 +532,12 @@ class ReviewViewSet(ModelViewSet):
             context={**self.get_serializer_context(), "story": story}
         )
         serializer.is_valid(raise_exception=True)
-        serializer.save(user=self.request.user, story=story)
+        with transaction.atomic():
+            serializer.save(user=self.request.user, story=story)
+            update_author_counters(authors_of(story.id), total_reviews=1)
+
+        touch_stamp(reviews_stamp_key(story.id))
+        record_activity(story, "review")
 
     def perform_update(self, serializer):
         review = self.get_object()
@@ -259,6 +548,16 @@ class ReviewViewSet(ModelViewSet):
             )
 
         serializer.save()
+        touch_stamp(reviews_stamp_key(review.story_id))
+
+    def perform_destroy(self, instance):
+        story_id = instance.story_id
+
+        with transaction.atomic():
+            instance.delete()
+            update_author_counters(authors_of(story_id), total_reviews=-1)
+
+        touch_stamp(reviews_stamp_key(story_id))
 
 
 
@@ -271,7 +570,7 @@ class RatingView(APIView):
     def post(self, request, story_id):
         story = get_object_or_404(Story, id=story_id)
 
-        if request.user == story.author.user:
+        if is_story_author(request, story):
             return Response(
                 {"detail": "Authors cannot rate their own story"},
                 status=status.HTTP_400_BAD_REQUEST
@@ -287,13 +586,14 @@ class RatingView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        Rating.objects.create(
+        rating = Rating.objects.create(
             user=request.user,
             story=story,
             rating=serializer.validated_data["rating"]
         )
 
-        self._update_story_rating(story)
+        update_rating_aggregates(story.id, added=rating.rating)
+        record_activity(story, "rating")
 
         return Response(
             {"message": "Rating added successfully."},
@@ -310,18 +610,23 @@ class RatingView(APIView):
         )
         serializer.is_valid(raise_exception=True)
 
-        updated = Rating.objects.filter(
+        rating = Rating.objects.select_for_update().filter(
             user=request.user,
             story=story
-        ).update(rating=serializer.validated_data["rating"])
+        ).first()
 
-        if not updated:
+        if rating is None:
             return Response(
                 {"detail": "Rating not found."},
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        self._update_story_rating(story)
+        old_rating, new_rating = rating.rating, serializer.validated_data["rating"]
+
+        if old_rating != new_rating:
+            rating.rating = new_rating
+            rating.save(update_fields=["rating"])
+            update_rating_aggregates(story.id, added=new_rating, removed=old_rating)
 
         return Response(
             {"message": "Rating updated successfully."},
@@ -332,26 +637,43 @@ class RatingView(APIView):
     def delete(self, request, story_id):
         story = get_object_or_404(Story, id=story_id)
 
-        try:
-            rating = Rating.objects.get(user=request.user, story=story)
-            rating.delete()
-
-            self._update_story_rating(story)
-
-            return Response(status=status.HTTP_204_NO_CONTENT)
+        rating = Rating.objects.select_for_update().filter(
+            user=request.user,
+            story=story
+        ).first()
 
-        except Rating.DoesNotExist:
+        if rating is None:
             return Response(
                 {"detail": "Rating not found."},
                 status=status.HTTP_404_NOT_FOUND
             )
 
-    def _update_story_rating(self, story):
-        agg = Rating.objects.filter(story=story).aggregate(
-            avg=Avg("rating"),
-            count=Count("id")
-        )
-        Story.objects.filter(id=story.id).update(
-            total_ratings=agg["count"] or 0,
-            average_rating=agg["avg"] or 0
+        # a concurrent DELETE of the same rating already took it out of the aggregates
+        deleted, _ = rating.delete()
+        if deleted:
+            update_rating_aggregates(story.id, removed=rating.rating)
+
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+
+class RatingDistributionView(LoadSheddingMixin, APIView):
+    """
+    Rating distribution of a story, read from its running aggregates without scanning Rating.
+    """
+    permission_classes = [AllowAny]
+    throttle_classes = [StoryAnonThrottle, StoryUserThrottle]
+    low_priority_actions = ("get",)
+
+    def get(self, request, story_id):
+        story = get_object_or_404(
+            Story.objects.only("id", "total_ratings", "average_rating", *RATING_STAR_FIELDS),
+            id=story_id
         )
+
+        return Response({
+            "story": story.id,
+            "total_ratings": story.total_ratings,
+            "average_rating": story.average_rating,
+            "distribution": story.rating_distribution,
+        })